@@ -52,6 +52,7 @@
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from helpers.persona import PersonaLookup, level_based_keys, render_keys
 pd.set_option('display.max_columns', None)
 pd.set_option('display.width', 500)
 pd.set_option('display.float_format', lambda x: '%.2f' % x)
@@ -150,11 +151,14 @@ age_df.head()
 # Örneğin birden fazla şu ifadeden olabilir: USA_ANDROID_MALE_0_18
 # Bunları groupby'a alıp price ortalamalarını almak gerekmektedir.
 age_df.drop(['AGE', 'PRICE'], axis=1).values
-age_df['CUSTOMERS_LEVEL_BASED'] = ['_'.join(col) for col in age_df.drop(['AGE', 'PRICE'], axis=1).values]
-age_df.head()
-
-age_df = age_df.groupby('CUSTOMERS_LEVEL_BASED').agg({'PRICE': 'mean'})
-age_df.reset_index(inplace=True)
+# age_df['CUSTOMERS_LEVEL_BASED'] = ['_'.join(col) for col in age_df.drop(['AGE', 'PRICE'], axis=1).values]
+# age_df = age_df.groupby('CUSTOMERS_LEVEL_BASED').agg({'PRICE': 'mean'})
+# her satır için string birleştirmek yerine COUNTRY, SOURCE, SEX ve yaş aralığı tek bir int64 anahtara
+# kodlanır; groupby tamsayılar üzerinde çalışır, isimler sadece sonuç için oluşturulur.
+keys, categories = level_based_keys(age_df)
+age_df = age_df.groupby(keys).agg({'PRICE': 'mean'})
+age_df['CUSTOMERS_LEVEL_BASED'] = render_keys(age_df.index, categories)
+age_df = age_df[['CUSTOMERS_LEVEL_BASED', 'PRICE']].reset_index(drop=True)
 age_df.head()
 age_df.shape
 
@@ -181,4 +185,19 @@ age_df[age_df['CUSTOMERS_LEVEL_BASED'] == new_user]
 
 # Türkiye’den IOS kullanıcısı olan 25 yaşındaki bir erkek kullanıcının ortalama ne kadar gelir kazandır?
 new_user = 'tur_ios_male_24_30'
-age_df[age_df['CUSTOMERS_LEVEL_BASED'] == new_user]
\ No newline at end of file
+age_df[age_df['CUSTOMERS_LEVEL_BASED'] == new_user]
+
+# age_df bir kez indekslenir; her yeni kullanıcı tüm tabloyu taramadan O(1) ile bulunur.
+lookup = PersonaLookup(age_df)
+lookup['tur_ios_male_24_30']  # (PRICE, SEGMENT)
+
+# yeni kullanıcılar toplu halde: yaş, pd.cut ile aynı aralıklara atanır
+new_users = pd.DataFrame({'COUNTRY': ['tur', 'fra', 'tur'],
+                          'SOURCE': ['android', 'ios', 'ios'],
+                          'SEX': ['female', 'female', 'male'],
+                          'AGE': [33, 35, 25]})
+new_users.join(lookup.lookup_users(new_users['COUNTRY'], new_users['SOURCE'], new_users['SEX'], new_users['AGE']))
+
+# segment tablosu kaydedilir; online skorlama servisi bu tabloyu başlangıçta bir kez yükler:
+# python -m helpers.persona_service datasets/persona_segments.csv 8080
+age_df.to_csv('datasets/persona_segments.csv', index=False)
\ No newline at end of file
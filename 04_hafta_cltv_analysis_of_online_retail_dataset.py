@@ -6,6 +6,7 @@
 
 # import libraries
 import pandas as pd
+from helpers.loaders import load_online_retail
 from sklearn.preprocessing import MinMaxScaler
 
 pd.set_option('display.max_columns', None)
@@ -14,9 +15,8 @@ pd.set_option('display.float_format', lambda x: '%.2f' % x)
 
 # read dataset
 
-df_ = pd.read_excel('datasets/online_retail_II.xlsx', sheet_name='Year 2009-2010')
+df_ = load_online_retail(sheet_name='Year 2009-2010')
 df = df_.copy()
-df.columns = [col.lower() for col in df.columns]
 df.head()
 
 # delete the observations with 'C' in the invoice variable
@@ -132,7 +132,6 @@ def create_cltv(dataframe, profit=0.10, save=False):
 
 # call the dataframe again
 df = df_.copy()
-df.columns = [col.lower() for col in df.columns]
 create_cltv(df, save=True)
 
 
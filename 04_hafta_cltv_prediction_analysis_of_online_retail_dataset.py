@@ -5,6 +5,10 @@
 # import libraries
 import datetime as dt
 import pandas as pd
+from helpers.cltv import score_cltv_parallel
+from helpers.loaders import load_online_retail
+from helpers.model_registry import fit_bgf, fit_ggf
+from helpers.outliers import winsorize
 import seaborn as sns
 import matplotlib.pyplot as plt
 from lifetimes import GammaGammaFitter, BetaGeoFitter
@@ -28,10 +32,8 @@ def replace_with_thresholds(dataframe, variable):
     dataframe.loc[(dataframe[variable] > up_limit), variable] = round(up_limit, 0)
 
 # import dataset
-df_ = pd.read_excel('datasets/online_retail_II.xlsx', 
-                    sheet_name='Year 2010-2011')
+df_ = load_online_retail(sheet_name='Year 2010-2011')
 df = df_.copy()
-df.columns = [col.lower() for col in df.columns]
 df.head()
 df.isnull().sum()
 
@@ -56,8 +58,10 @@ sns.boxplot(x = df['quantity'])
 plt.show(block=True)
 
 # supressing the outliers
-replace_with_thresholds(df, 'quantity')
-replace_with_thresholds(df, 'price')
+# replace_with_thresholds(df, 'quantity')
+# replace_with_thresholds(df, 'price')
+thresholds = winsorize(df, ['quantity', 'price'], q1=0.01, q3=0.99, rounding='replacement')
+thresholds
 
 # after supressing the outliers with thresholds, check the outlier using box plot
 sns.boxplot(x = df['price'])
@@ -190,14 +194,13 @@ for col in num_cols:
     decision_process(cltv_final, 'segment', col)
 
 # functionalization of all process
-def create_cltv_prediction(dataframe, month=3):
+def create_cltv_prediction(dataframe, month=3, n_jobs=1, registry_dir=None, return_metrics=False):
     # data preparation
     dataframe.dropna(inplace=True)
     dataframe = dataframe[~dataframe["invoice"].str.contains("C", na=False)]
     dataframe = dataframe[dataframe["quantity"] > 0]
     dataframe = dataframe[dataframe["price"] > 0]
-    replace_with_thresholds(dataframe, "quantity")
-    replace_with_thresholds(dataframe, "price")
+    winsorize(dataframe, ["quantity", "price"], q1=0.01, q3=0.99, rounding='replacement')
     dataframe["total_price"] = dataframe["quantity"] * dataframe["price"]
     today_date = dt.datetime(2011, 12, 11)
 
@@ -215,52 +218,41 @@ def create_cltv_prediction(dataframe, month=3):
     cltv_df["T"] = cltv_df["T"] / 7
 
     # establishement of bg-nbd model
-    bgf = BetaGeoFitter(penalizer_coef=0.001)
-    bgf.fit(cltv_df['frequency'],
-            cltv_df['recency'],
-            cltv_df['T'])
-
-    cltv_df["expected_purc_1_week"] = bgf.predict(1,
-                                                  cltv_df['frequency'],
-                                                  cltv_df['recency'],
-                                                  cltv_df['T'])
-
-    cltv_df["expected_purc_1_month"] = bgf.predict(4,
-                                                   cltv_df['frequency'],
-                                                   cltv_df['recency'],
-                                                   cltv_df['T'])
-
-    cltv_df["expected_purc_3_month"] = bgf.predict(12,
-                                                   cltv_df['frequency'],
-                                                   cltv_df['recency'],
-                                                   cltv_df['T'])
+    # with a registry_dir, the params of the last fit are reused (same data) or used as the starting point
+    bgf, bgf_metrics = fit_bgf(cltv_df['frequency'],
+                               cltv_df['recency'],
+                               cltv_df['T'],
+                               penalizer_coef=0.001,
+                               registry_dir=registry_dir,
+                               compress=True)  # fitted on the unique (frequency, recency, T) rows with weights
 
     # establishement of gamma gamma model
-    ggf = GammaGammaFitter(penalizer_coef=0.01)
-    ggf.fit(cltv_df['frequency'], cltv_df['monetary'])
-    cltv_df["expected_average_profit"] = ggf.conditional_expected_average_profit(cltv_df['frequency'],
-                                                                                 cltv_df['monetary'])
-
-    # calculation of cltv using bg-nbd and gg models
-    cltv = ggf.customer_lifetime_value(bgf,
-                                       cltv_df['frequency'],
-                                       cltv_df['recency'],
-                                       cltv_df['T'],
-                                       cltv_df['monetary'],
-                                       time=month,  # 3 aylık
-                                       freq="W",  # T'nin frekans bilgisi.
-                                       discount_rate=0.01)
-
-    cltv = cltv.reset_index()
-    cltv_final = cltv_df.merge(cltv, on="customer id", how="left")
+    ggf, ggf_metrics = fit_ggf(cltv_df['frequency'], cltv_df['monetary'],
+                               penalizer_coef=0.01,
+                               registry_dir=registry_dir,
+                               compress=True)
+
+    # expected purchases in 1 week, 1 month and 3 months, expected average profit and cltv
+    # in one pass, sharded over n_jobs processes
+    scores = score_cltv_parallel(bgf, ggf, cltv_df,
+                                 n_jobs=n_jobs,
+                                 month=month,  # 3 aylık
+                                 freq="W",  # T'nin frekans bilgisi.
+                                 discount_rate=0.01)
+
+    cltv_final = cltv_df.join(scores).reset_index()
 
     # creating the segments
     cltv_final["segment"] = pd.qcut(cltv_final["clv"], 4, labels=["D", "C", "B", "A"])
 
+    # with return_metrics=True also the fit time, optimizer iterations and reuse of the registered params
+    if return_metrics:
+        return cltv_final, bgf_metrics, ggf_metrics
     return cltv_final
 
 
 df = df_.copy()
-df.columns = [col.lower() for col in df.columns]
-cltv_final2 = create_cltv_prediction(df)
+cltv_final2, bgf_metrics, ggf_metrics = create_cltv_prediction(df, return_metrics=True)
+bgf_metrics
+ggf_metrics
 cltv_final2.to_csv('cltv_prediction.csv')
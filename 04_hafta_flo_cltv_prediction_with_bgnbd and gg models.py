@@ -42,6 +42,9 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 from lifetimes import GammaGammaFitter, BetaGeoFitter
 from lifetimes.plotting import plot_period_transactions
+from helpers.cltv import predict_horizons
+from helpers.model_registry import fit_bgf, fit_ggf
+from helpers.outliers import winsorize
 from sklearn.preprocessing import MinMaxScaler
 
 # making some adjsutments
@@ -83,8 +86,11 @@ df.describe().T
 # Step 3: If the variables "order_num_total_ever_online", "order_num_total_ever_offline", 
 # "customer_value_total_ever_offline", "customer_value_total_ever_online" have outliers, suppress them
 variables = [col for col in df.columns if 'ever' in col]
-for col in variables:
-    replace_with_thresholds(df, col)
+# for col in variables:
+#     replace_with_thresholds(df, col)
+# the quantiles of all four variables in one call, limits rounded with round() as in outlier_thresholds
+thresholds = winsorize(df, variables, q1=0.05, q3=0.95, rounding='limits')
+thresholds
 
 # Step 4: Omnichannel means that customers shop from both online and offline platforms.
 # Create new variables for each customer's total purchases and spending
@@ -141,30 +147,35 @@ cltv_df["t_weekly"] = cltv_df["t_weekly"] / 7
 # Task 3: Establishment of BG/NBD, Gamma-Gamma Models and Calculation of CLTV
 
 # Step 1: Fit the BG/NBD model
-bgf = BetaGeoFitter(penalizer_coef=0.001).fit(
+# the fitted params are kept in the registry 'models': if the data did not change they are reused,
+# otherwise they are the starting point of the optimizer. fit time and evaluations are in bgf_metrics
+bgf, bgf_metrics = fit_bgf(
     cltv_df['frequency'], 
     cltv_df['recency_cltv_weekly'], 
-    cltv_df['t_weekly'])
+    cltv_df['t_weekly'],
+    penalizer_coef=0.001,
+    registry_dir='models')
+bgf_metrics
 
 # output: <lifetimes.BetaGeoFitter: fitted with 19945 subjects, a: 0.00, alpha: 80.49, b: 0.00, r: 3.83>
 
-# Estimate expected purchases from customers in 3 months and add exp_sales_3_month to cltv dataframe
-cltv_df['expected_purc_3_month'] = bgf.conditional_expected_number_of_purchases_up_to_time(12,
-    cltv_df['frequency'],
-    cltv_df['recency_cltv_weekly'],
-    cltv_df['t_weekly'])
-
-# Estimate expected purchases from customers in 6 months and add exp_sales_6_month to cltv dataframe
-cltv_df['expected_purc_6_month'] = bgf.conditional_expected_number_of_purchases_up_to_time(24,
+# Estimate expected purchases from customers in 3 and 6 months and add exp_sales_3_month and exp_sales_6_month
+# to cltv dataframe. both horizons are predicted in one call, which gives the same values as
+# bgf.conditional_expected_number_of_purchases_up_to_time(12, ...) and (24, ...)
+horizons = {'expected_purc_3_month': 12, 'expected_purc_6_month': 24}
+cltv_df[list(horizons)] = predict_horizons(bgf, horizons,
     cltv_df['frequency'],
     cltv_df['recency_cltv_weekly'],
     cltv_df['t_weekly'])
 
-plot_period_transactions(bgf)
-plt.show(block=True)
+# a reused model has no fitted data to plot
+if not bgf_metrics['reused']:
+    plot_period_transactions(bgf)
+    plt.show(block=True)
 
 # Step 2: Fit the Gamma-Gamma model
-ggf = GammaGammaFitter(penalizer_coef=0.01).fit(cltv_df['frequency'], cltv_df['monetary_cltv_avg'])
+ggf, ggf_metrics = fit_ggf(cltv_df['frequency'], cltv_df['monetary_cltv_avg'], penalizer_coef=0.01, registry_dir='models')
+ggf_metrics
 # output: <lifetimes.GammaGammaFitter: fitted with 19945 subjects, p: 2.69, q: 0.14, v: 2.63>
 
 # Estimate the average value of the customers and add it to the cltv dataframe as exp_average_value
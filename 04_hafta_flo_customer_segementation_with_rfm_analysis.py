@@ -43,6 +43,7 @@ interested_in_categories_12:	Müşterinin son 12 ayda alışveriş yaptığı ka
 import datetime as dt
 from operator import index
 import pandas as pd
+from helpers.rfm import assign_segments
 import seaborn as sns
 import matplotlib.pyplot as plt
 
@@ -222,7 +223,8 @@ seg_map = {
 }
 
 # Step 2: Convert the scores into segments with the help of the seg_map below
-rfm['segment'] = rfm['rf_score'].replace(seg_map, regex=True)
+# same labels as rfm['rf_score'].replace(seg_map, regex=True), looked up in the compiled 5x5 table
+rfm['segment'] = assign_segments(rfm['recency_score'], rfm['frequency_score'], seg_map)
 rfm.head(10)
 
 # Task 5: Action time
@@ -2,6 +2,9 @@
 
 # import the libraries
 import datetime as dt
+from helpers import eda
+from helpers.loaders import load_online_retail
+from helpers.rfm import RFMScorer, assign_segments, rfm_metrics
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -10,9 +13,8 @@ pd.set_option('display.width', 500)
 pd.set_option('display.float_format', lambda x: '%.3f' % x)
 
 # import the dataset
-df_ = pd.read_excel('datasets/online_retail_II.xlsx', sheet_name='Year 2010-2011')
+df_ = load_online_retail(sheet_name='Year 2010-2011')
 df = df_.copy()
-df.columns = [col.lower() for col in df.columns]
 df.head()
 
 # check dataframe
@@ -26,7 +28,9 @@ def check_dataframe(dataframe, head=10):
     print(dataframe.isnull().sum())
     print(dataframe.describe().T)
 
-check_dataframe(df)
+# check_dataframe(df)
+# one profile of the frame instead of info, isnull and describe scans
+eda.check_df(df, head=10)
 
 # grabing the variables categorical, numerical, and cardinal
 def grab_col_names(dataframe, cat_th=10, car_th=20):
@@ -57,7 +61,8 @@ def grab_col_names(dataframe, cat_th=10, car_th=20):
     # hesaplanan degerleri tutma
     return cat_cols, num_cols, cat_but_car
 
-cat_cols, num_cols, cat_but_car = grab_col_names(df)
+# cat_cols, num_cols, cat_but_car = grab_col_names(df)
+cat_cols, num_cols, cat_but_car = eda.grab_col_names(df)
 
 # examine the cardinal variables
 df['country'].value_counts()
@@ -141,7 +146,8 @@ segment_map = {r'[1-2][1-2]': 'hibernating',
     r'[4-5][2-3]': 'potential_loyalists',
     r'5[4-5]': 'champions'}
 
-rfm['segments'] = rfm['rf_score'].replace(segment_map, regex=True)
+# same labels as rfm['rf_score'].replace(segment_map, regex=True), looked up in the compiled 5x5 table
+rfm['segments'] = assign_segments(rfm['recency_score'], rfm['frequency_score'], segment_map)
 
 # examine the mean and count values of the scores according to segments
 rfm.groupby('segments').agg(
@@ -171,12 +177,7 @@ def create_rfm(dataframe, csv=False):
 
     # calculation of rfm metrics
     today_date = dt.datetime(2011, 12, 11)
-    rfm = dataframe.groupby('customer id').agg({
-        'invoicedate' : lambda date: (today_date - date.max()).days,
-        'invoice' : lambda num: num.nunique(),
-        'total_price': lambda total_price: total_price.sum()
-    })
-    rfm.columns = ['recency', 'frequency', 'monetary']
+    rfm = rfm_metrics(dataframe, today_date)
     rfm = rfm[rfm['monetary'] > 0]
 
     # calculation of rfm scores
@@ -184,9 +185,6 @@ def create_rfm(dataframe, csv=False):
     rfm['frequency_score'] = pd.qcut(rfm['frequency'].rank(method='first'), 5, labels=[1, 2, 3, 4, 5])
     rfm['monetary_score'] = pd.qcut(rfm['monetary'], 5, labels=[1, 2, 3, 4, 5])
 
-    # getting rfm scores
-    rfm['rfm_score'] = (rfm['recency_score'].astype(str) + rfm['frequency_score'].astype(str))
-
     # nomenclatures of the segments
     seg_map = {
         r'[1-2][1-2]': 'hibernating',
@@ -201,7 +199,7 @@ def create_rfm(dataframe, csv=False):
         r'5[4-5]': 'champions'
     }
 
-    rfm['segments'] = rfm['rfm_score'].replace(seg_map, regex=True)
+    rfm['segments'] = assign_segments(rfm['recency_score'], rfm['frequency_score'], seg_map)
     rfm = rfm[['recency', 'frequency', 'monetary', 'segments']]
     rfm.index = rfm.index.astype(int)
 
@@ -213,7 +211,12 @@ def create_rfm(dataframe, csv=False):
 
 # call the dataset again
 df = df_.copy()
-df.columns = [col.lower() for col in df.columns]
 rfm_new = create_rfm(df)     # can not create the csv file
 rfm_new = create_rfm(df, csv=True) # create the csv file
-rfm_new.head()
\ No newline at end of file
+rfm_new.head()
+
+# scoring new customers with the quintile edges of this population, without a new qcut over all customers
+scorer = RFMScorer().fit(rfm)
+# scorer.save('rfm_scorer.json')
+# scorer = RFMScorer.load('rfm_scorer.json')
+scorer.score(recency=10, frequency=8, monetary=2500)
\ No newline at end of file
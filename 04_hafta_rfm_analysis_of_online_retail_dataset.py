@@ -3,14 +3,15 @@
 import pandas as pd
 from helpers import eda
 import datetime as dt
+from helpers.loaders import load_online_retail
+from helpers.rfm import assign_segments, rfm_metrics
 pd.set_option('display.max_columns', None)
 # pd.set_option('display.max_rows', None
 pd.set_option('display.width', 500)
 pd.set_option('display.float_format', lambda x: '%.3f' % x)
 
 # import the dateset
-df_ = pd.read_excel('datasets/online_retail_II.xlsx', sheet_name='Year 2009-2010')
-df_.columns = [col.lower() for col in df_.columns]
+df_ = load_online_retail(sheet_name='Year 2009-2010')
 df = df_.copy()
 df.head()
 
@@ -123,8 +124,9 @@ seg_map = {
     r'5[4-5]': 'champions'
 }
 
-# to add the nomenclatures in the dataframe, use replace() method
-rfm['segments'] = rfm['rfm_score'].replace(seg_map, regex=True)
+# to add the nomenclatures in the dataframe, look up the r and f scores in the compiled seg_map table
+# (same labels as rfm['rfm_score'].replace(seg_map, regex=True), without running the regexes per customer)
+rfm['segments'] = assign_segments(rfm['recency_score'], rfm['frequency_score'], seg_map)
 
 # reaching the average scores and counts of recency, frequency, monetary in those classes
 rfm[['segments', 'recency', 'frequency', 'monetary']].groupby('segments').agg(['mean', 'count'])
@@ -158,12 +160,7 @@ def create_rfm(dataframe, csv=False):
 
     # calculation of rfm metrics
     today_date = dt.datetime(2011, 12, 11)
-    rfm = dataframe.groupby('customer id').agg({
-        'invoicedate' : lambda date: (today_date - date.max()).days,
-        'invoice' : lambda num: num.nunique(),
-        'total_price': lambda total_price: total_price.sum()
-    })
-    rfm.columns = ['recency', 'frequency', 'monetary']
+    rfm = rfm_metrics(dataframe, today_date)
     rfm = rfm[rfm['monetary'] > 0]
 
     # calculation of rfm scores
@@ -171,9 +168,6 @@ def create_rfm(dataframe, csv=False):
     rfm['frequency_score'] = pd.qcut(rfm['frequency'].rank(method='first'), 5, labels=[1, 2, 3, 4, 5])
     rfm['monetary_score'] = pd.qcut(rfm['monetary'], 5, labels=[1, 2, 3, 4, 5])
 
-    # getting rfm scores
-    rfm['rfm_score'] = (rfm['recency_score'].astype(str) + rfm['frequency_score'].astype(str))
-
     # nomenclatures of the segments
     seg_map = {
         r'[1-2][1-2]': 'hibernating',
@@ -188,7 +182,7 @@ def create_rfm(dataframe, csv=False):
         r'5[4-5]': 'champions'
     }
 
-    rfm['segments'] = rfm['rfm_score'].replace(seg_map, regex=True)
+    rfm['segments'] = assign_segments(rfm['recency_score'], rfm['frequency_score'], seg_map)
     rfm = rfm[['recency', 'frequency', 'monetary', 'segments']]
     rfm.index = rfm.index.astype(int)
 
@@ -200,7 +194,6 @@ def create_rfm(dataframe, csv=False):
 
 # call the dataset again
 df = df_.copy()
-df.columns = [col.lower() for col in df.columns]
 rfm_new = create_rfm(df)     # can not create the csv file
 rfm_new = create_rfm(df, csv=True) # create the csv file
 rfm_new.head() 
@@ -3,6 +3,7 @@ import pandas as pd
 import math
 import datetime as dt
 import scipy.stats as st
+from helpers.rating import bucketed_weighted_rating
 from sklearn.preprocessing import MinMaxScaler
 pd.set_option('display.max_columns', None)
 pd.set_option('display.max_rows', None)
@@ -130,5 +131,10 @@ weighted_rating(df)
 weighted_rating(df, 0.4, 0.6)
 weighted_rating(df, 0.6, 0.4)
 
+# the three averages in one pass over the reviews instead of eight masked means
+bucketed_weighted_rating(df)
+bucketed_weighted_rating(df, 0.4, 0.6)
+bucketed_weighted_rating(df, day_weights=[0.30, 0.26, 0.22, 0.22], progress_weights=[0.20, 0.24, 0.26, 0.30])
+
 # bayesian average rating
 # if there is the distribution of the ratings, we can here apply the bayesian average rating function.
\ No newline at end of file
@@ -2,6 +2,8 @@
 # Case Study
 ##############################################
 
+from helpers import review_ranking
+
 ##############################################
 # preparing a datafram from an e-trade company
 ##############################################
@@ -17,7 +19,8 @@ df = pd.DataFrame({"up": up, "down": down})
 def scores_pos_ned_diff(up, down):
     return up - down
 
-df['scores_pos_ned_diff'] = df.apply(lambda x: scores_pos_ned_diff(x['up'], x['down']), axis=1)
+# same values as df.apply(lambda x: scores_pos_ned_diff(x['up'], x['down']), axis=1), for all reviews at once
+df['scores_pos_ned_diff'] = review_ranking.scores_pos_ned_diff(df['up'], df['down'])
 
 ##############################################
 # adding the 'score_average_rating' variable
@@ -27,7 +30,8 @@ def score_average_rating(up, down):
     if up + down == 0: return 0
     return up / (up + down)
 
-df['score_average_rating'] = df.apply(lambda x: score_average_rating(x['up'], x['down']), axis=1)
+# same values as df.apply(lambda x: score_average_rating(x['up'], x['down']), axis=1)
+df['score_average_rating'] = review_ranking.score_average_rating(df['up'], df['down'])
 
 ##############################################
 # adding the 'wilson_lower_bound' variable
@@ -40,7 +44,11 @@ def wilson_lower_bound(up, down, confidence=0.95):
     phat = 1.0 * up / n
     return (phat + z * z / (2 * n) - z * math.sqrt((phat * (1 - phat) + z * z / (4 * n)) / n)) / (1 + z * z / n)
 
-df['wilson_lower_bound'] = df.apply(lambda x: wilson_lower_bound(x['up'], x['down']), axis=1)
+# same values as df.apply(lambda x: wilson_lower_bound(x['up'], x['down']), axis=1)
+df['wilson_lower_bound'] = review_ranking.wilson_lower_bound(df['up'], df['down'])
 
 # sorting the dataframe by 'wlb' scores
-df.sort_values('wilson_lower_bound', ascending=False)
\ No newline at end of file
+df.sort_values('wilson_lower_bound', ascending=False)
+
+# for large comment tables, only the best k reviews are sorted
+review_ranking.rank_reviews(df[['up', 'down']], k=10)
\ No newline at end of file
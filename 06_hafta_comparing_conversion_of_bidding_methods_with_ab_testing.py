@@ -8,6 +8,7 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import statsmodels.stats.api as sms
 from scipy.stats import shapiro, levene, ttest_ind
+from helpers.ab_testing import ab_test_battery, ab_test_from_stats, sufficient_stats
 
 pd.set_option('display.max_columns', None)
 pd.set_option('display.max_rows', 10)
@@ -264,6 +265,18 @@ Therefore, there is no statistically significant difference between the mean val
 The difference between mean values is a chance. 
 """
 
+# the same decision (shapiro, levene, ttest_ind or mannwhitneyu) and the confidence intervals
+# for all metrics at once, from a long table with one row per (group, metric) value
+long_df = df.melt(var_name='column', value_name='value')
+long_df[['metric', 'group']] = long_df['column'].str.split('_', expand=True)
+long_df['experiment'] = 'bidding'
+ab_test_battery(long_df, control='control', test='test')
+
+# the same t-tests and intervals from the sufficient statistics of the groups (n, sum, sum of squares),
+# which can be pre-aggregated per shard (and merged with merge_stats) instead of loading every row
+stats = sufficient_stats(long_df)
+ab_test_from_stats(stats, control='control', test='test', equal_var=True)
+
 ######################################################################
 # Task 4: Analysis of Results
 ######################################################################
@@ -0,0 +1,60 @@
+##########################################################################
+# Benchmark: A/B tests on all rows vs. merged sufficient statistics
+##########################################################################
+# impression-level rows (revenue and a 0/1 purchase flag) of many a/b tests
+# are split into shards; every shard is reduced to its sufficient statistics
+# and only those summaries are merged and tested.
+#
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_ab_stats             # 10M rows, 20 shards
+#   python -m benchmarks.bench_ab_stats 50000000 100
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from scipy.stats import ttest_ind
+from statsmodels.stats.proportion import proportions_ztest
+from helpers.ab_testing import ab_test_from_stats, merge_stats, sufficient_stats
+
+
+def make_impressions(n_rows, n_experiments=50, seed=42):
+    rng = np.random.default_rng(seed)
+    experiment = rng.integers(0, n_experiments, n_rows)
+    is_test = rng.random(n_rows) < 0.5
+    purchase = (rng.random(n_rows) < np.where(is_test, 0.021, 0.02)).astype('int8')
+    return pd.DataFrame({'experiment': experiment, 'metric': 'revenue',
+                         'group': np.where(is_test, 'test', 'control'),
+                         'value': purchase * rng.gamma(2.0, 30.0, n_rows), 'purchase': purchase})
+
+
+def run(n_rows, n_shards):
+    df = make_impressions(n_rows)
+    bounds = np.linspace(0, n_rows, n_shards + 1).astype('int64')
+    shards = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    start = time.perf_counter()
+    summaries = [sufficient_stats(shard, conversions='purchase') for shard in shards]
+    shard_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    results = ab_test_from_stats(merge_stats(*summaries)).set_index(['experiment', 'metric'])
+    analysis_seconds = time.perf_counter() - start
+
+    # the raw-row tests of the script, per experiment
+    start = time.perf_counter()
+    for experiment, rows in df.groupby('experiment'):
+        control, test = rows[rows['group'] == 'control'], rows[rows['group'] == 'test']
+        welch = ttest_ind(control['value'], test['value'], equal_var=False)
+        z, z_pvalue = proportions_ztest([control['purchase'].sum(), test['purchase'].sum()], [len(control), len(test)])
+        row = results.loc[(experiment, 'revenue')]
+        assert np.allclose([row['pvalue'], row['z_pvalue']], [welch.pvalue, z_pvalue], rtol=1e-6)
+    raw_seconds = time.perf_counter() - start
+
+    summary_bytes = sum(summary.memory_usage(deep=True).sum() for summary in summaries)
+    print(f'{n_rows:>11,} rows in {n_shards} shards | raw rows {df.memory_usage(deep=True).sum() / 2 ** 20:8.1f} MB, '
+          f'summaries {summary_bytes / 2 ** 10:6.1f} KB | shard summaries {shard_seconds:5.2f} s, '
+          f'analysis {analysis_seconds * 1e3:5.1f} ms | raw-row tests {raw_seconds:5.2f} s, same p-values')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000, int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,54 @@
+##########################################################################
+# Benchmark: scipy tests per (experiment, metric) vs. ab_test_battery
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_ab_testing             # 300 experiments x 12 metrics, 40-2000 values per group
+#   python -m benchmarks.bench_ab_testing 1000 40 200  # many small experiments
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+import statsmodels.stats.api as sms
+from scipy.stats import shapiro, levene, ttest_ind, mannwhitneyu
+from helpers.ab_testing import ab_test_battery
+from benchmarks.synthetic import make_ab_tests
+
+
+def scipy_tests(long_df, alpha=0.05):
+    # normal_assumption, variance_homogenity, parametric_test and confidence_range of the script per pair
+    rows = {}
+    for (experiment, metric), pair in long_df.groupby(['experiment', 'metric']):
+        control = pair.loc[pair['group'] == 'control', 'value'].to_numpy()
+        test = pair.loc[pair['group'] == 'test', 'value'].to_numpy()
+        normal = shapiro(control).pvalue >= alpha and shapiro(test).pvalue >= alpha
+        if normal:
+            result = ttest_ind(control, test, equal_var=levene(control, test).pvalue >= alpha)
+        else:
+            result = mannwhitneyu(control, test, method='asymptotic')
+        sms.DescrStatsW(control).tconfint_mean()
+        sms.DescrStatsW(test).tconfint_mean()
+        rows[(experiment, metric)] = result.pvalue
+    return pd.Series(rows)
+
+
+def run(n_experiments, min_size=40, max_size=2000):
+    long_df = make_ab_tests(n_experiments, min_size=min_size, max_size=max_size)
+
+    start = time.perf_counter()
+    expected = scipy_tests(long_df)
+    scipy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = ab_test_battery(long_df)
+    battery_seconds = time.perf_counter() - start
+
+    pvalues = results.set_index(['experiment', 'metric'])['pvalue']
+    assert np.allclose(pvalues.loc[expected.index].to_numpy(), expected.to_numpy(), rtol=1e-6)
+    print(results['test'].value_counts().to_dict())
+    print(f'{n_experiments:>6,} experiments x 12 metrics, {len(long_df):,} rows | scipy per pair {scipy_seconds:6.2f} s | '
+          f'ab_test_battery {battery_seconds:6.2f} s ({scipy_seconds / battery_seconds:5.1f}x), same p-values')
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:]] or [300])
@@ -0,0 +1,54 @@
+##########################################################################
+# Benchmark: bayesian_average_rating with apply vs. the batch version
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_bayesian_rating            # 20000 items
+#   python -m benchmarks.bench_bayesian_rating 1000000
+
+import math
+import sys
+import time
+import numpy as np
+import pandas as pd
+import scipy.stats as st
+from helpers.rating import bayesian_average_rating_batch
+
+STARS = ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten']
+
+
+def bayesian_average_rating(n, confidence=0.95):
+    # the scalar function of 05_hafta_imdb_movie_scoring_and_sorting.py
+    if sum(n) == 0:
+        return 0
+    K = len(n)
+    z = st.norm.ppf(1 - (1 - confidence) / 2)
+    N = sum(n)
+    first_part = 0.0
+    second_part = 0.0
+    for k, n_k in enumerate(n):
+        first_part += (k + 1) * (n[k] + 1) / (N + K)
+        second_part += (k + 1) * (k + 1) * (n[k] + 1) / (N + K)
+    score = first_part - z * math.sqrt((second_part - first_part * first_part) / (N + K + 1))
+    return score
+
+
+def run(n_items):
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame(rng.poisson(rng.gamma(1.0, 500.0, (n_items, 1)), (n_items, len(STARS))), columns=STARS)
+    df.iloc[:10] = 0
+
+    start = time.perf_counter()
+    expected = df.apply(lambda x: bayesian_average_rating(x[STARS].to_numpy()), axis=1)
+    apply_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = bayesian_average_rating_batch(df[STARS])
+    batch_seconds = time.perf_counter() - start
+
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-12)
+    print(f'{n_items:>11,} items | apply {apply_seconds:7.2f} s | batch {batch_seconds:7.4f} s | '
+          f'speedup {apply_seconds / batch_seconds:8.1f}x')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
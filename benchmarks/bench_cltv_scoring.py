@@ -0,0 +1,44 @@
+##########################################################################
+# Benchmark: single-threaded vs. process pool CLTV scoring
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_cltv_scoring                  # 1M customers, all usable cores
+#   python -m benchmarks.bench_cltv_scoring 4000000 4        # customers, n_jobs
+#
+# score_cltv_parallel never runs more processes than usable cores, so on a
+# single core both runs score in the current process.
+
+import sys
+import time
+import pandas as pd
+from lifetimes import BetaGeoFitter, GammaGammaFitter
+from helpers.cltv import score_cltv, score_cltv_parallel, usable_cores
+from benchmarks.synthetic import make_lifetime_data
+
+
+def run(n_customers, n_jobs):
+    cltv_df = make_lifetime_data(n_customers)
+
+    # the models are fitted on a sample, only the scoring is measured
+    sample = cltv_df.sample(20_000, random_state=42)
+    bgf = BetaGeoFitter(penalizer_coef=0.001).fit(sample['frequency'], sample['recency'], sample['T'])
+    ggf = GammaGammaFitter(penalizer_coef=0.01).fit(sample['frequency'], sample['monetary'])
+
+    start = time.perf_counter()
+    expected = score_cltv(bgf, ggf, cltv_df)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = score_cltv_parallel(bgf, ggf, cltv_df, n_jobs=n_jobs)
+    parallel = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(scores, expected)
+    n_processes = min(n_jobs, usable_cores())
+    print(f'{n_customers:>11,} customers | serial {serial:7.2f} s | {n_processes} processes on {usable_cores()} '
+          f'usable cores {parallel:7.2f} s | speedup {serial / parallel:5.2f}x')
+
+
+if __name__ == '__main__':
+    n_customers = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else usable_cores()
+    run(n_customers, n_jobs)
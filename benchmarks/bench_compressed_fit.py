@@ -0,0 +1,44 @@
+##########################################################################
+# Benchmark: BG-NBD / Gamma-Gamma fit on all customers vs. compressed rows
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_compressed_fit            # 200000 customers
+#   python -m benchmarks.bench_compressed_fit 1000000
+
+import sys
+import time
+import numpy as np
+from helpers.cltv import compress_lifetime_data, expected_purchases
+from helpers.model_registry import fit_bgf, fit_ggf
+from benchmarks.synthetic import make_lifetime_data
+
+
+def run(n_customers):
+    cltv_df = make_lifetime_data(n_customers)
+    compact, inverse = compress_lifetime_data(cltv_df)
+    print(f'{n_customers:,} customers -> {len(compact):,} unique (frequency, recency, T) rows')
+
+    args = (cltv_df['frequency'], cltv_df['recency'], cltv_df['T'])
+    bgf, full = fit_bgf(*args)
+    bgf_compressed, compressed = fit_bgf(*args, compress=True)
+    print(f"bg-nbd fit | all rows {full['fit_seconds']:6.2f} s | compressed {compressed['fit_seconds']:6.2f} s | "
+          f"max param difference {np.max(np.abs(bgf.params_ - bgf_compressed.params_) / bgf.params_):.1e}")
+
+    _, full = fit_ggf(cltv_df['frequency'], cltv_df['monetary'])
+    _, compressed = fit_ggf(cltv_df['frequency'], cltv_df['monetary'], compress=True)
+    print(f"gamma-gamma fit | all rows {full['fit_seconds']:6.2f} s | compressed {compressed['fit_seconds']:6.2f} s "
+          f"({compressed['n_rows']:,} rows)")
+
+    # predictions on the compact rows, broadcast back with the inverse index
+    start = time.perf_counter()
+    expected = bgf.predict(12, *args)
+    predict = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = expected_purchases(bgf.params_, [12], compact['frequency'], compact['recency'], compact['T'])[inverse, 0]
+    compact_predict = time.perf_counter() - start
+    np.testing.assert_allclose(scores, expected, rtol=1e-12)
+    print(f'predict 12 weeks | all rows {predict:6.3f} s | compressed {compact_predict:6.3f} s')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
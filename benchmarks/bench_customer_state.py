@@ -0,0 +1,80 @@
+##########################################################################
+# Benchmark: rebuilding rfm / cltv from the whole history vs. customer state
+##########################################################################
+# the invoices are split into a history and daily deltas. after every day
+# the rfm metrics and the cltv frame from the updated state (after a save
+# and load) are checked against rfm_metrics and the aggregation of
+# create_cltv_prediction on the whole history up to that day.
+#
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_customer_state              # 1M invoice lines, 7 daily deltas
+#   python -m benchmarks.bench_customer_state 10000000 30
+
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+from helpers.customer_state import (build_state, cltv_from_state, load_state, prepare_cltv_invoices, rfm_from_state,
+                                    save_state, update_state)
+from helpers.outliers import outlier_thresholds
+from helpers.rfm import prepare_invoices, rfm_metrics
+from benchmarks.synthetic import make_invoices
+
+
+def cltv_lambda(dataframe, today_date):
+    # the aggregation block of create_cltv_prediction
+    cltv_df = dataframe.groupby('customer id').agg(
+        {'invoicedate': [lambda invoicedate: (invoicedate.max() - invoicedate.min()).days,
+                         lambda invoicedate: (today_date - invoicedate.min()).days],
+         'invoice': lambda invoice: invoice.nunique(),
+         'total_price': lambda total_price: total_price.sum()})
+    cltv_df.columns = cltv_df.columns.droplevel(0)
+    cltv_df.columns = ['recency', 'T', 'frequency', 'monetary']
+    cltv_df['monetary'] = cltv_df['monetary'] / cltv_df['frequency']
+    cltv_df = cltv_df[(cltv_df['frequency'] > 1)]
+    cltv_df['recency'] = cltv_df['recency'] / 7
+    cltv_df['T'] = cltv_df['T'] / 7
+    return cltv_df[['recency', 'T', 'frequency', 'monetary']]
+
+
+def run(n_rows, n_days):
+    df = make_invoices(n_rows)
+    days = df['invoicedate'].dt.normalize()
+    last_days = sorted(days.unique())[-n_days:]
+    history, deltas = df[days < last_days[0]], [df[days == day] for day in last_days]
+
+    # the outlier thresholds of the cltv preparation are frozen on the history
+    thresholds = outlier_thresholds(prepare_invoices(history.copy()), ['quantity', 'price'], 0.01, 0.99)
+    rfm_state = build_state(prepare_invoices(history.copy()))
+    cltv_state = build_state(prepare_cltv_invoices(history, thresholds))
+    path = os.path.join(tempfile.mkdtemp(), 'state.pkl')
+
+    rebuild_seconds = update_seconds = 0.0
+    for day, delta in zip(last_days, deltas):
+        today_date = pd.Timestamp(day) + pd.Timedelta(days=1)
+        start = time.perf_counter()
+        rfm_state = update_state(rfm_state, prepare_invoices(delta.copy()))
+        cltv_state = update_state(cltv_state, prepare_cltv_invoices(delta, thresholds))
+        save_state(rfm_state, path)
+        rfm = rfm_from_state(load_state(path), today_date)
+        cltv_df = cltv_from_state(cltv_state, today_date)
+        update_seconds += time.perf_counter() - start
+
+        upto = df[days <= day]
+        start = time.perf_counter()
+        expected_rfm = rfm_metrics(prepare_invoices(upto.copy()), today_date)
+        expected_cltv = cltv_lambda(prepare_cltv_invoices(upto, thresholds), today_date)
+        rebuild_seconds += time.perf_counter() - start
+
+        pd.testing.assert_frame_equal(rfm, expected_rfm, check_exact=False)
+        pd.testing.assert_frame_equal(cltv_df, expected_cltv, check_exact=False)
+
+    print(f'{n_rows:>11,} lines, {n_days} daily deltas, same rfm and cltv frames | '
+          f'rebuild {rebuild_seconds:7.2f} s | state updates {update_seconds:7.2f} s '
+          f'({rebuild_seconds / update_seconds:5.1f}x)')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 7)
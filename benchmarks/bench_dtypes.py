@@ -0,0 +1,41 @@
+##########################################################################
+# Benchmark: memory of the invoice frame before and after optimize_dtypes
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_dtypes             # 1M invoice lines
+#   python -m benchmarks.bench_dtypes 10000000
+
+import sys
+import time
+import pandas as pd
+from helpers.loaders import optimize_dtypes
+from helpers.rfm import create_rfm
+from benchmarks.synthetic import make_invoices
+
+
+def run(n_rows):
+    # object strings and float customer id, as read_excel returns them
+    df = make_invoices(n_rows).astype({'invoice': 'object', 'stockcode': 'object', 'country': 'object'})
+
+    start = time.perf_counter()
+    optimized, report = optimize_dtypes(df)
+    optimize_seconds = time.perf_counter() - start
+    print(report.round(2))
+
+    timings = {}
+    for name, frame in [('original', df), ('optimized', optimized)]:
+        start = time.perf_counter()
+        rfm = create_rfm(frame.copy())
+        timings[name] = (time.perf_counter() - start, rfm)
+
+    # same rfm table, only the dtype of the customer id index differs
+    pd.testing.assert_frame_equal(timings['original'][1], timings['optimized'][1],
+                                  check_index_type=False, check_dtype=False)
+    total = report.loc['total']
+    print(f'{n_rows:>11,} rows | {total["mb_before"]:8.1f} MB -> {total["mb_after"]:7.1f} MB '
+          f'({total["mb_before"] / total["mb_after"]:4.1f}x) in {optimize_seconds:5.2f} s | '
+          f'copy + create_rfm {timings["original"][0]:6.2f} s -> {timings["optimized"][0]:6.2f} s, same rfm table')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,79 @@
+##########################################################################
+# Benchmark: check_df + grab_col_names of the scripts vs. eda.profile
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_eda                # 1M invoice lines
+#   python -m benchmarks.bench_eda 10000000
+
+import io
+import sys
+import time
+import numpy as np
+import pandas as pd
+from helpers import eda
+from benchmarks.synthetic import make_invoices
+
+
+def scripts_profile(dataframe):
+    # the separate scans of check_dataframe and grab_col_names in the scripts, without the printing
+    dataframe.info(buf=io.StringIO())
+    dataframe.isnull().values.any()
+    dataframe.isnull().sum()
+    dataframe.describe(eda.QUANTILES).T
+    return scripts_col_names(dataframe)
+
+
+def scripts_col_names(dataframe, cat_th=10, car_th=20):
+    cat_cols = [col for col in dataframe.columns if dataframe[col].dtypes == 'O']
+    num_but_cat = [col for col in dataframe.columns if
+                   dataframe[col].nunique() < cat_th and dataframe[col].dtypes != 'O']
+    cat_but_car = [col for col in dataframe.columns if
+                   dataframe[col].nunique() > car_th and dataframe[col].dtypes == 'O']
+    return cat_cols, num_but_cat, cat_but_car
+
+
+def run(n_rows):
+    df = make_invoices(n_rows)
+    df = df.astype({col: 'object' for col in ['invoice', 'stockcode', 'country']})
+
+    start = time.perf_counter()
+    scripts_profile(df)
+    scripts_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats = eda.profile(df)
+    eda.grab_col_names(df, stats=stats, verbose=False)
+    profile_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats = eda.profile(df, sample=100_000)
+    eda.grab_col_names(df, stats=stats, verbose=False)
+    sampled_seconds = time.perf_counter() - start
+
+    print(f'{n_rows:>11,} rows | scripts {scripts_seconds:7.2f} s | profile {profile_seconds:7.2f} s '
+          f'({scripts_seconds / profile_seconds:4.1f}x) | sampled 100k {sampled_seconds:7.3f} s '
+          f'({scripts_seconds / sampled_seconds:5.1f}x)')
+
+    # grab_col_names alone: nunique twice per column vs. the exact profile vs. cardinality='hll', which
+    # sketches the high-cardinality datetime columns (event_time, random timestamps)
+    df['event_time'] = pd.to_datetime(np.random.default_rng(0).integers(1.2e18, 1.3e18, n_rows))
+    start = time.perf_counter()
+    _, num_but_cat, cat_but_car = scripts_col_names(df)
+    nunique_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact_names = eda.grab_col_names(df, verbose=False)
+    exact_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hll_names = eda.grab_col_names(df, cardinality='hll', verbose=False)
+    hll_seconds = time.perf_counter() - start
+
+    assert hll_names == exact_names and hll_names[2] == cat_but_car
+    assert all(col in hll_names[0] for col in num_but_cat)
+    print(f'{n_rows:>11,} rows | grab_col_names nunique {nunique_seconds:7.2f} s | exact {exact_seconds:7.2f} s '
+          f'| hll {hll_seconds:7.2f} s ({exact_seconds / hll_seconds:4.1f}x exact)')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
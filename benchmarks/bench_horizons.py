@@ -0,0 +1,44 @@
+##########################################################################
+# Benchmark: bgf.predict per horizon vs. predict_horizons
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_horizons              # 1M customers
+#   python -m benchmarks.bench_horizons 200000
+
+import sys
+import time
+import numpy as np
+from lifetimes import BetaGeoFitter
+from helpers.cltv import predict_horizons
+from benchmarks.synthetic import make_lifetime_data
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(n_customers):
+    cltv_df = make_lifetime_data(n_customers)
+    sample = cltv_df.sample(20_000, random_state=42)
+    bgf = BetaGeoFitter(penalizer_coef=0.001).fit(sample['frequency'], sample['recency'], sample['T'])
+    args = (cltv_df['frequency'], cltv_df['recency'], cltv_df['T'])
+
+    for horizons in [[1, 4, 12], [12, 24], [1, 4, 12, 24, 52]]:
+        expected, loop = timeit(lambda: {t: bgf.predict(t, *args) for t in horizons})
+        result, vectorized = timeit(predict_horizons, bgf, horizons, *args)
+        for t in horizons:
+            np.testing.assert_allclose(result[t], expected[t], rtol=1e-12, atol=1e-12)
+        print(f'{n_customers:>11,} customers | horizons {str(horizons):<20} | predict loop {loop:6.2f} s | '
+              f'predict_horizons {vectorized:6.2f} s | speedup {loop / vectorized:5.1f}x')
+
+    # cost of one more horizon
+    _, one = timeit(predict_horizons, bgf, [12], *args)
+    _, two = timeit(predict_horizons, bgf, [12, 24], *args)
+    print(f'one horizon {one:6.3f} s | one more horizon {two - one:6.3f} s')
+
+
+if __name__ == '__main__':
+    n_customers = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    run(n_customers)
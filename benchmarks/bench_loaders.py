@@ -0,0 +1,50 @@
+##########################################################################
+# Benchmark: cold read_excel vs. warm parquet cache
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_loaders                  # datasets/online_retail_II.xlsx
+#   python -m benchmarks.bench_loaders 200000           # synthetic xlsx with 200000 rows per sheet
+
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+from helpers.loaders import ONLINE_RETAIL_PATH, ONLINE_RETAIL_SHEETS, load_online_retail
+from benchmarks.synthetic import make_invoices
+
+
+def synthetic_xlsx(n_rows, directory):
+    path = os.path.join(directory, 'online_retail_II.xlsx')
+    with pd.ExcelWriter(path) as writer:
+        for seed, sheet_name in enumerate(ONLINE_RETAIL_SHEETS):
+            df = make_invoices(n_rows, seed=seed)
+            df.columns = ['Invoice', 'StockCode', 'Quantity', 'InvoiceDate', 'Price', 'Customer ID', 'Country']
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return path
+
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run(path, cache_dir):
+    for sheet_name in ONLINE_RETAIL_SHEETS:
+        xlsx = timeit(pd.read_excel, path, sheet_name=sheet_name)
+        cold = timeit(load_online_retail, sheet_name, path=path, cache_dir=cache_dir)
+        warm = timeit(load_online_retail, sheet_name, path=path, cache_dir=cache_dir)
+        projected = timeit(load_online_retail, sheet_name, path=path, cache_dir=cache_dir,
+                           columns=['invoice', 'invoicedate', 'customer id'])
+        print(f'{sheet_name} | read_excel {xlsx:7.2f} s | cold cache {cold:7.2f} s | '
+              f'warm cache {warm:6.3f} s | warm, 3 columns {projected:6.3f} s')
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        if len(sys.argv) > 1:
+            source = synthetic_xlsx(int(sys.argv[1]), directory)
+        else:
+            source = ONLINE_RETAIL_PATH
+        run(source, os.path.join(directory, 'cache'))
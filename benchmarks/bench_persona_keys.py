@@ -0,0 +1,41 @@
+##########################################################################
+# Benchmark: level based keys with '_'.join per row vs. int64 keys
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_persona_keys               # 1M rows
+#   python -m benchmarks.bench_persona_keys 20000000
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from helpers.persona import level_based_keys, render_keys, AGE_BINS, AGE_LABELS
+from benchmarks.synthetic import make_persona
+
+
+def run(n_rows):
+    df = make_persona(n_rows)
+
+    # GÖREV 5 - 6 of 03_hafta_kural_tabanli_siniflandirma_mg.py on every row
+    start = time.perf_counter()
+    joined = df[['COUNTRY', 'SOURCE', 'SEX']].copy()
+    joined['NEW_AGE'] = pd.cut(df['AGE'], bins=AGE_BINS, labels=AGE_LABELS)
+    joined['CUSTOMERS_LEVEL_BASED'] = ['_'.join(col) for col in joined.values]
+    joined['PRICE'] = df['PRICE']
+    expected = joined.groupby('CUSTOMERS_LEVEL_BASED').agg({'PRICE': 'mean'})
+    join_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    keys, categories = level_based_keys(df)
+    prices = df.groupby(keys).agg({'PRICE': 'mean'})
+    prices.index = render_keys(prices.index, categories)
+    keys_seconds = time.perf_counter() - start
+
+    np.testing.assert_array_equal(prices.index, expected.index)
+    np.testing.assert_allclose(prices['PRICE'], expected['PRICE'], rtol=1e-12)
+    print(f'{n_rows:>11,} rows | join + groupby {join_seconds:7.2f} s | int64 keys + groupby {keys_seconds:7.3f} s | '
+          f'speedup {join_seconds / keys_seconds:5.1f}x')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
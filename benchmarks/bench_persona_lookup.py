@@ -0,0 +1,70 @@
+##########################################################################
+# Benchmark: persona lookup with a scan of age_df vs. PersonaLookup
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_persona_lookup             # 1M users in the batch
+#   python -m benchmarks.bench_persona_lookup 10000000
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from helpers.persona import PersonaLookup, AGE_BINS, AGE_LABELS
+from benchmarks.synthetic import make_persona
+
+
+def make_age_df(df):
+    # GÖREV 3 - 7 of 03_hafta_kural_tabanli_siniflandirma_mg.py
+    age_df = df.groupby(['COUNTRY', 'SOURCE', 'SEX', 'AGE']).agg({'PRICE': 'mean'}).sort_values('PRICE', ascending=False)
+    age_df.reset_index(inplace=True)
+    age_df['NEW_AGE'] = pd.cut(age_df['AGE'], bins=AGE_BINS, labels=AGE_LABELS)
+    age_df['CUSTOMERS_LEVEL_BASED'] = ['_'.join(col) for col in age_df.drop(['AGE', 'PRICE'], axis=1).values]
+    age_df = age_df.groupby('CUSTOMERS_LEVEL_BASED').agg({'PRICE': 'mean'})
+    age_df.reset_index(inplace=True)
+    age_df['SEGMENT'] = pd.qcut(age_df['PRICE'], 4, labels=['D', 'C', 'B', 'A'])
+    return age_df
+
+
+def percentiles(seconds):
+    return [np.percentile(seconds, q) * 1e6 for q in (50, 99)]
+
+
+def run(n_users, n_single=2_000):
+    age_df = make_age_df(make_persona(5_000))
+    lookup = PersonaLookup(age_df)
+    users = make_persona(n_users, seed=7)
+    users.loc[users.index[:10], 'AGE'] = 80
+
+    # single lookups: scan of age_df vs. the dict
+    keys = age_df['CUSTOMERS_LEVEL_BASED'].sample(n_single, replace=True, random_state=42).to_list()
+    scan, indexed = [], []
+    for key in keys:
+        start = time.perf_counter()
+        expected = age_df[age_df['CUSTOMERS_LEVEL_BASED'] == key]
+        scan.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        price, segment = lookup[key]
+        indexed.append(time.perf_counter() - start)
+        assert (price, segment) == (expected['PRICE'].iloc[0], expected['SEGMENT'].iloc[0])
+    print('single key | scan p50 {:8.1f} us, p99 {:8.1f} us'.format(*percentiles(scan)),
+          '| dict p50 {:6.2f} us, p99 {:6.2f} us'.format(*percentiles(indexed)))
+
+    # batch of users: keys built per row and merged vs. the code table
+    start = time.perf_counter()
+    new_age = pd.cut(users['AGE'], bins=AGE_BINS, labels=AGE_LABELS).astype(str)
+    user_keys = users['COUNTRY'] + '_' + users['SOURCE'] + '_' + users['SEX'] + '_' + new_age
+    expected = pd.DataFrame({'CUSTOMERS_LEVEL_BASED': user_keys}).merge(age_df, how='left')
+    merge_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = lookup.lookup_users(users['COUNTRY'], users['SOURCE'], users['SEX'], users['AGE'])
+    batch_seconds = time.perf_counter() - start
+
+    np.testing.assert_array_equal(scores['PRICE'], expected['PRICE'])
+    np.testing.assert_array_equal(scores['SEGMENT'].astype(str).fillna(''), expected['SEGMENT'].astype(str).fillna(''))
+    print(f'{n_users:>11,} users | keys + merge {merge_seconds:7.3f} s | lookup_users {batch_seconds:7.3f} s '
+          f'({n_users / batch_seconds / 1e6:5.1f}M users/s) | speedup {merge_seconds / batch_seconds:5.1f}x')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
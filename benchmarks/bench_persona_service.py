@@ -0,0 +1,98 @@
+##########################################################################
+# Load test of the persona scoring service on localhost
+##########################################################################
+# starts helpers.persona_service in a separate process and sends requests
+# from concurrent keep-alive connections.
+#
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_persona_service                 # 20000 requests, 64 connections
+#   python -m benchmarks.bench_persona_service 100000 256       # requests, connections
+
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+import numpy as np
+from helpers.persona_service import serve
+from benchmarks.synthetic import make_persona
+from benchmarks.bench_persona_lookup import make_age_df
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+
+def _serve(age_df):
+    asyncio.run(serve(age_df, HOST, PORT))
+
+
+async def _request(reader, writer, method, path, payload=None):
+    body = b'' if payload is None else json.dumps(payload).encode()
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: {HOST}\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+    await writer.drain()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+    return json.loads(await reader.readexactly(length))
+
+
+async def _client(users, latencies):
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    for user in users:
+        start = time.perf_counter()
+        await _request(reader, writer, 'POST', '/score', user)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def _wait_for_server(timeout=30):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(HOST, PORT)
+            health = await _request(reader, writer, 'GET', '/health')
+            writer.close()
+            return health
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def _load_test(n_requests, n_connections):
+    await _wait_for_server()
+    users = make_persona(n_requests, seed=7).rename(columns=str.lower)
+    users = users[['country', 'source', 'sex', 'age']].to_dict('records')
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(users[i::n_connections], latencies) for i in range(n_connections)])
+    seconds = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(HOST, PORT)
+    health = await _request(reader, writer, 'GET', '/health')
+    writer.close()
+    p50, p99 = [np.percentile(latencies, q) * 1e3 for q in (50, 99)]
+    print(f'{n_requests:>9,} requests, {n_connections} connections | {n_requests / seconds:8,.0f} requests/s | '
+          f'latency p50 {p50:6.2f} ms, p99 {p99:6.2f} ms | mean batch {health["scored"] / health["batches"]:6.1f} users')
+
+
+def run(n_requests, n_connections):
+    age_df = make_age_df(make_persona(5_000))
+    server = multiprocessing.Process(target=_serve, args=(age_df,), daemon=True)
+    server.start()
+    try:
+        asyncio.run(_load_test(n_requests, n_connections))
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    n_connections = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    run(n_requests, n_connections)
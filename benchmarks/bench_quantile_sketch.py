@@ -0,0 +1,135 @@
+##########################################################################
+# Benchmark: quantile sketches vs. exact pandas quantiles
+##########################################################################
+# the rfm metrics and the flo columns are split into partitions, every
+# partition is summarized by TDigest sketches (and frequency counts), the
+# summaries are merged, and the limits, edges and scores derived from them
+# are compared with outlier_thresholds and rfm_scores on the whole frame.
+# the run fails if the sketches miss the error documented in TDigest: rank
+# error within 0.001 (the limits must be those of such quantiles) and the
+# qcut score of at least 99.5% of the customers.
+#
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_quantile_sketch               # 1M customers, 10 partitions
+#   python -m benchmarks.bench_quantile_sketch 10000000 50
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from helpers.outliers import outlier_thresholds, sketch_thresholds
+from helpers.rfm import frequency_counts, qcut_edges, qcut_scores, ranked_frequency_scores, rfm_scores
+from helpers.sketches import digest_columns
+from benchmarks.synthetic import make_flo, make_rfm
+
+QUANTILES = [0.01, 0.05, 0.2, 0.4, 0.6, 0.8, 0.95, 0.99]
+# documented error of TDigest: rank error of the quantiles and share of the customers with the qcut score
+MAX_RANK_ERROR = 1e-3
+MIN_AGREEMENT = 0.995
+
+
+def split(dataframe, n_partitions):
+    bounds = np.linspace(0, len(dataframe), n_partitions + 1).astype('int64')
+    return [dataframe.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def merge_digests(summaries):
+    digests = summaries[0]
+    for other in summaries[1:]:
+        for col in digests:
+            digests[col].merge(other[col])
+    return digests
+
+
+def rank_errors(values, digest):
+    # distance of q to the fractions of the values below and up to the sketch quantile (0 within the ties)
+    ordered = np.sort(values)
+    approx, q = digest.quantile(QUANTILES), np.array(QUANTILES)
+    below = np.searchsorted(ordered, approx, side='left') / len(ordered)
+    up_to = np.searchsorted(ordered, approx, side='right') / len(ordered)
+    return np.maximum(np.maximum(below - q, q - up_to), 0)
+
+
+def limit_bounds(dataframe, variables, q1, q3, rank_error=MAX_RANK_ERROR):
+    # the limits of quantiles within rank_error of q1 and q3: low_limit = 2.5 * q1 - 1.5 * q3 and
+    # up_limit = 2.5 * q3 - 1.5 * q1 grow with one quantile and shrink with the other
+    lower = {q: dataframe[variables].quantile(q, interpolation='lower') for q in [q1 - rank_error, q3 - rank_error]}
+    higher = {q: dataframe[variables].quantile(q, interpolation='higher') for q in [q1 + rank_error, q3 + rank_error]}
+    low_q1, high_q1 = lower[q1 - rank_error], higher[q1 + rank_error]
+    low_q3, high_q3 = lower[q3 - rank_error], higher[q3 + rank_error]
+    return pd.DataFrame({'low_min': 2.5 * low_q1 - 1.5 * high_q3, 'low_max': 2.5 * high_q1 - 1.5 * low_q3,
+                         'up_min': 2.5 * low_q3 - 1.5 * high_q1, 'up_max': 2.5 * high_q3 - 1.5 * low_q1})
+
+
+def check_thresholds(n_customers, n_partitions):
+    df = make_flo(n_customers)
+    variables = list(df.columns)
+    start = time.perf_counter()
+    digests = merge_digests([digest_columns(part, variables) for part in split(df, n_partitions)])
+    sketch_seconds = time.perf_counter() - start
+
+    for q1, q3 in [(0.05, 0.95), (0.01, 0.99)]:
+        exact = outlier_thresholds(df, variables, q1, q3)
+        approx = sketch_thresholds(digests, q1, q3)
+        errors = (approx[['low_limit', 'up_limit']] - exact[['low_limit', 'up_limit']]).abs()
+        print(f'limits q1={q1} q3={q3}: max relative error of up_limit '
+              f'{(errors["up_limit"] / exact["up_limit"].abs()).max():.2e}, '
+              f'same rounded limits for {(approx[["low_limit", "up_limit"]].round() == exact[["low_limit", "up_limit"]].round()).all(axis=1).sum()} '
+              f'of {len(variables)} columns')
+        # the sketch limits are the limits of quantiles within the rank error bound
+        bounds = limit_bounds(df, variables, q1, q3)
+        assert approx['low_limit'].between(bounds['low_min'], bounds['low_max']).all()
+        assert approx['up_limit'].between(bounds['up_min'], bounds['up_max']).all()
+    print('rank error of the sketch quantiles', QUANTILES)
+    for col in variables:
+        errors = rank_errors(df[col].to_numpy(), digests[col])
+        print(f'  {col:35s}', np.round(errors, 5))
+        assert (errors <= MAX_RANK_ERROR).all()
+    print(f'flo sketches of {n_customers:,} customers in {n_partitions} partitions: {sketch_seconds:.2f} s')
+
+
+def check_scores(n_customers, n_partitions):
+    rfm = make_rfm(n_customers)
+    start = time.perf_counter()
+    exact = rfm_scores(rfm.copy())
+    exact_seconds = time.perf_counter() - start
+
+    # every partition is summarized on its own, the summaries are merged
+    start = time.perf_counter()
+    partitions = split(rfm, n_partitions)
+    digests = merge_digests([digest_columns(part, ['recency', 'monetary']) for part in partitions])
+    counts = [frequency_counts(part['frequency']) for part in partitions]
+    total_counts = pd.concat(counts, axis=1).fillna(0).sum(axis=1).astype('int64')
+    recency_edges, monetary_edges = qcut_edges(digests['recency']), qcut_edges(digests['monetary'])
+
+    # and every partition is scored with the merged summaries
+    scores = []
+    offsets = pd.Series(dtype='int64')
+    for part, part_counts in zip(partitions, counts):
+        scores.append(pd.DataFrame({
+            'recency_score': qcut_scores(part['recency'], recency_edges, [5, 4, 3, 2, 1]),
+            'frequency_score': ranked_frequency_scores(part['frequency'], total_counts, offsets),
+            'monetary_score': qcut_scores(part['monetary'], monetary_edges, [1, 2, 3, 4, 5])}, index=part.index))
+        offsets = offsets.add(part_counts, fill_value=0)
+    scores = pd.concat(scores)
+    sketch_seconds = time.perf_counter() - start
+
+    print('rank error of the sketch quantiles', QUANTILES)
+    for col in ['recency', 'monetary']:
+        errors = rank_errors(rfm[col].to_numpy(), digests[col])
+        print(f'  {col:35s}', np.round(errors, 5))
+        assert (errors <= MAX_RANK_ERROR).all()
+    for col in ['recency_score', 'frequency_score', 'monetary_score']:
+        agreement = (scores[col].to_numpy() == exact[col].astype('int64').to_numpy()).mean()
+        print(f'  {col:15s} same score as pd.qcut for {agreement:.4%} of the customers')
+        assert agreement >= MIN_AGREEMENT
+    assert (scores['frequency_score'].to_numpy() == exact['frequency_score'].astype('int64').to_numpy()).all()
+    print(f'rfm scores of {n_customers:,} customers: rfm_scores {exact_seconds:.2f} s | '
+          f'{n_partitions} partitions with merged sketches {sketch_seconds:.2f} s')
+
+
+if __name__ == '__main__':
+    n_customers = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_partitions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    check_thresholds(n_customers, n_partitions)
+    check_scores(n_customers, n_partitions)
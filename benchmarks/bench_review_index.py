@@ -0,0 +1,46 @@
+##########################################################################
+# Benchmark: replay of a synthetic vote log through ReviewRankingIndex
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_review_index                  # 1M votes
+#   python -m benchmarks.bench_review_index 5000000 10       # votes, k
+
+import sys
+import time
+import numpy as np
+from helpers.review_ranking import ReviewRankingIndex
+
+
+def make_vote_log(n_votes, n_products=1_000, reviews_per_product=500, seed=42):
+    # popular products and reviews get most of the votes
+    rng = np.random.default_rng(seed)
+    products = np.minimum(rng.zipf(1.3, n_votes), n_products) - 1
+    reviews = np.minimum(rng.zipf(1.5, n_votes), reviews_per_product) - 1
+    is_up = rng.random(n_votes) < 0.7
+    return products.tolist(), reviews.tolist(), is_up.tolist()
+
+
+def run(n_votes, k, reads_every=10):
+    products, reviews, is_up = make_vote_log(n_votes)
+    index = ReviewRankingIndex(k=k)
+    read_latencies = []
+
+    start = time.perf_counter()
+    for i, (product, review, up) in enumerate(zip(products, reviews, is_up)):
+        index.vote(product, review, up=int(up), down=int(not up))
+        # a page view of the product after every reads_every votes
+        if i % reads_every == 0:
+            read_start = time.perf_counter_ns()
+            index.top(product)
+            read_latencies.append(time.perf_counter_ns() - read_start)
+    seconds = time.perf_counter() - start
+
+    read_latencies = np.array(read_latencies) / 1_000
+    print(f'{n_votes:,} votes, k={k} | {n_votes / seconds:,.0f} votes/s (reads included) | '
+          f'read latency p50 {np.percentile(read_latencies, 50):.1f} us, p99 {np.percentile(read_latencies, 99):.1f} us')
+
+
+if __name__ == '__main__':
+    n_votes = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    run(n_votes, k)
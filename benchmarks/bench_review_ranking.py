@@ -0,0 +1,72 @@
+##########################################################################
+# Benchmark: review scores with apply vs. array operations and top-k
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_review_ranking                   # 100000 reviews with apply, 10M without
+#   python -m benchmarks.bench_review_ranking 20000 50000000
+
+import math
+import sys
+import time
+import numpy as np
+import pandas as pd
+import scipy.stats as st
+from helpers.review_ranking import rank_reviews, score_average_rating, wilson_lower_bound
+
+
+def score_average_rating_scalar(up, down):
+    # the functions of 05_hafta_sorting_reviews_application.py
+    if up + down == 0: return 0
+    return up / (up + down)
+
+
+def wilson_lower_bound_scalar(up, down, confidence=0.95):
+    n = up + down
+    if n == 0: return 0
+    z = st.norm.ppf(1 - (1 - confidence) / 2)
+    phat = 1.0 * up / n
+    return (phat + z * z / (2 * n) - z * math.sqrt((phat * (1 - phat) + z * z / (4 * n)) / n)) / (1 + z * z / n)
+
+
+def make_reviews(n_reviews, seed=42):
+    rng = np.random.default_rng(seed)
+    votes = rng.poisson(rng.gamma(0.5, 40.0, n_reviews))
+    up = rng.binomial(votes, rng.beta(5.0, 2.0, n_reviews))
+    return pd.DataFrame({'up': up, 'down': votes - up})
+
+
+def compare_with_apply(n_reviews):
+    df = make_reviews(n_reviews)
+    start = time.perf_counter()
+    expected_average = df.apply(lambda x: score_average_rating_scalar(x['up'], x['down']), axis=1)
+    expected_wilson = df.apply(lambda x: wilson_lower_bound_scalar(x['up'], x['down']), axis=1)
+    apply_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    average = score_average_rating(df['up'], df['down'])
+    wilson = wilson_lower_bound(df['up'], df['down'])
+    array_seconds = time.perf_counter() - start
+
+    np.testing.assert_allclose(average, expected_average, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(wilson, expected_wilson, rtol=0, atol=1e-12)
+    print(f'{n_reviews:>11,} reviews | apply {apply_seconds:7.2f} s | arrays {array_seconds:7.4f} s')
+
+
+def compare_ranking(n_reviews, k=100):
+    df = make_reviews(n_reviews)
+    start = time.perf_counter()
+    top = rank_reviews(df, k=k)
+    top_k_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ranked = rank_reviews(df).sort_values('wilson_lower_bound', ascending=False).head(k)
+    sort_seconds = time.perf_counter() - start
+
+    assert (top['wilson_lower_bound'].to_numpy() == ranked['wilson_lower_bound'].to_numpy()).all()
+    print(f'{n_reviews:>11,} reviews | top {k} with argpartition {top_k_seconds:6.2f} s | '
+          f'with full sort_values {sort_seconds:6.2f} s')
+
+
+if __name__ == '__main__':
+    compare_with_apply(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
+    compare_ranking(int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000)
@@ -0,0 +1,84 @@
+##########################################################################
+# Benchmark: lambda groupby vs. rfm engine
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_rfm               # 1M, 10M and 50M rows
+#   python -m benchmarks.bench_rfm 1000000       # selected sizes only
+#
+# first, the streaming mode is checked against create_rfm on a csv read
+# in chunks, with the lines in invoice order and shuffled.
+
+import os
+import sys
+import tempfile
+import time
+import datetime as dt
+import pandas as pd
+from helpers.rfm import (create_rfm, create_rfm_streaming, prepare_invoices, read_invoice_chunks, rfm_metrics,
+                         rfm_metrics_streaming)
+from benchmarks.synthetic import make_invoices
+
+today_date = dt.datetime(2011, 12, 11)
+
+
+def rfm_lambda(dataframe):
+    # the original block of create_rfm
+    rfm = dataframe.groupby('customer id').agg({
+        'invoicedate': lambda date: (today_date - date.max()).days,
+        'invoice': lambda num: num.nunique(),
+        'total_price': lambda total_price: total_price.sum()
+    })
+    rfm.columns = ['recency', 'frequency', 'monetary']
+    return rfm
+
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def check_streaming(n_rows=200_000, chunksize=30_000):
+    # a csv export read in chunks gives the metrics and the rfm frame of the whole table, in both modes
+    df = make_invoices(n_rows)
+    directory = tempfile.mkdtemp()
+    contiguous_path, shuffled_path = os.path.join(directory, 'lines.csv'), os.path.join(directory, 'shuffled.csv')
+    df.to_csv(contiguous_path, index=False)
+    df.sample(frac=1, random_state=42).to_csv(shuffled_path, index=False)
+
+    whole = next(read_invoice_chunks(contiguous_path, chunksize=n_rows))
+    expected = rfm_metrics(prepare_invoices(whole.copy()), today_date)
+    expected_rfm = create_rfm(whole.copy(), today_date)
+    cases = [(contiguous_path, False), (contiguous_path, True), (shuffled_path, False)]
+    for path, contiguous in cases:
+        rfm = rfm_metrics_streaming(read_invoice_chunks(path, chunksize), today_date, contiguous_invoices=contiguous)
+        pd.testing.assert_frame_equal(rfm, expected, check_exact=False)
+        rfm = create_rfm_streaming(read_invoice_chunks(path, chunksize), today_date, contiguous_invoices=contiguous)
+        pd.testing.assert_frame_equal(rfm, expected_rfm, check_exact=False)
+    print(f'streaming rfm of {n_rows:,} csv lines in chunks of {chunksize:,} same as create_rfm '
+          f'(contiguous and shuffled lines)')
+
+
+def run(n_rows):
+    df = make_invoices(n_rows)
+    df['total_price'] = df['quantity'] * df['price']
+    df.dropna(inplace=True)
+    df = df[~df['invoice'].str.contains('C', na=False)]
+
+    results = {}
+    expected, seconds = timeit(rfm_lambda, df)
+    results['lambda'] = seconds
+    for method in ['groupby', 'numpy']:
+        rfm, seconds = timeit(rfm_metrics, df, today_date, method=method)
+        pd.testing.assert_frame_equal(rfm, expected, check_exact=False)
+        results[method] = seconds
+
+    for name, seconds in results.items():
+        print(f'{n_rows:>11,} rows | {name:<8} | {seconds:8.2f} s | {n_rows / seconds:>14,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000, 50_000_000]
+    check_streaming()
+    for n_rows in sizes:
+        run(n_rows)
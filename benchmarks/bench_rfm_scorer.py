@@ -0,0 +1,93 @@
+##########################################################################
+# Benchmark: qcut over the population vs. a fitted RFMScorer
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_rfm_scorer             # 1M customers
+#   python -m benchmarks.bench_rfm_scorer 10000000
+#
+# before the timings, the scores of a fitted scorer are checked against
+# rfm_scores on the same population, also with skewed frequencies.
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from helpers.rfm import RFMScorer, rfm_scores
+from benchmarks.synthetic import make_rfm
+
+
+def check_scores(rfm, n_single=2000):
+    # recency and monetary: the scores of rfm_scores. frequency: the score of the middle customer of its
+    # frequency in rfm_scores (one of the two middle ones when the frequency has an even number of customers)
+    expected = rfm_scores(rfm.copy())
+    scorer = RFMScorer().fit(rfm)
+    path = os.path.join(tempfile.mkdtemp(), 'rfm_scorer.json')
+    scorer.save(path)
+    scorer = RFMScorer.load(path)
+    scores = scorer.transform(rfm)
+    for col in ['recency_score', 'monetary_score']:
+        assert (scores[col].to_numpy() == expected[col].astype('int64').to_numpy()).all(), col
+
+    # the scores of a frequency in rfm_scores increase with the rank, the middle ones are its median
+    ranked = expected['frequency_score'].astype('int64').groupby(rfm['frequency'])
+    low, high = ranked.quantile(0.5, interpolation='lower'), ranked.quantile(0.5, interpolation='higher')
+    frequency_scores = scores['frequency_score'].groupby(rfm['frequency']).agg(['min', 'max'])
+    assert (frequency_scores['min'] == frequency_scores['max']).all()
+    assert frequency_scores['min'].between(low, high).all()
+
+    for customer, row in zip(rfm[['recency', 'frequency', 'monetary']].head(n_single).itertuples(index=False),
+                             scores.head(n_single).itertuples(index=False)):
+        assert scorer.score(*customer) == tuple(row)
+
+
+def check_populations(n_customers):
+    rng = np.random.default_rng(3)
+    rfm = make_rfm(n_customers)
+    populations = {'make_rfm': rfm,
+                   'half frequency 1, half 2': rfm.assign(frequency=rng.integers(1, 3, n_customers)),
+                   '60% frequency 1': rfm.assign(frequency=np.where(rng.random(n_customers) < 0.6, 1, rfm['frequency'])),
+                   'same frequency': rfm.assign(frequency=3)}
+    for name, population in populations.items():
+        check_scores(population)
+    print(f'scores of {len(populations)} populations of {n_customers:,} customers same as rfm_scores')
+
+
+def run(n_customers, n_new=1000):
+    rfm = make_rfm(n_customers)
+    new = make_rfm(n_new, seed=7)
+
+    # without stored edges, a new customer means a qcut of the whole population again
+    start = time.perf_counter()
+    rfm_scores(rfm.copy())
+    qcut_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scorer = RFMScorer().fit(rfm)
+    fit_seconds = time.perf_counter() - start
+
+    path = os.path.join(tempfile.mkdtemp(), 'rfm_scorer.json')
+    scorer.save(path)
+    start = time.perf_counter()
+    scorer = RFMScorer.load(path)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for recency, frequency, monetary in new[['recency', 'frequency', 'monetary']].itertuples(index=False):
+        start = time.perf_counter()
+        scorer.score(recency, frequency, monetary)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1e6
+
+    start = time.perf_counter()
+    scorer.transform(rfm)
+    transform_seconds = time.perf_counter() - start
+
+    print(f'{n_customers:>11,} customers | rfm_scores {qcut_seconds:6.2f} s | fit {fit_seconds:6.2f} s | '
+          f'load {load_seconds * 1e3:5.2f} ms | score p50 {np.percentile(latencies, 50):5.2f} us '
+          f'p99 {np.percentile(latencies, 99):5.2f} us | transform of all {transform_seconds:6.2f} s')
+
+
+if __name__ == '__main__':
+    check_populations(100_000)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
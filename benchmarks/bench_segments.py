@@ -0,0 +1,54 @@
+##########################################################################
+# Benchmark: regex seg_map replace vs. compiled 5x5 segment lookup
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_segments              # 1M and 10M customers
+#   python -m benchmarks.bench_segments 100000
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from helpers.rfm import SEG_MAP, assign_segments
+
+
+def regex_segments(recency_score, frequency_score):
+    # the original path of the rfm scripts
+    rf_score = recency_score.astype(str) + frequency_score.astype(str)
+    return rf_score.replace(SEG_MAP, regex=True)
+
+
+def check_all_cells():
+    # every (recency_score, frequency_score) cell gets the label of the regex path
+    cells = [(r, f) for r in range(1, 6) for f in range(1, 6)]
+    recency_score = pd.Series(pd.Categorical([r for r, _ in cells], categories=[5, 4, 3, 2, 1]))
+    frequency_score = pd.Series(pd.Categorical([f for _, f in cells], categories=[1, 2, 3, 4, 5]))
+    expected = regex_segments(recency_score, frequency_score)
+    result = assign_segments(recency_score, frequency_score)
+    assert len(cells) == 25 and (result.astype(str) == expected).all()
+    print('all 25 cells match the regex path')
+
+
+def run(n_customers):
+    rng = np.random.default_rng(42)
+    recency_score = pd.Series(pd.Categorical(rng.integers(1, 6, n_customers), categories=[5, 4, 3, 2, 1]))
+    frequency_score = pd.Series(pd.Categorical(rng.integers(1, 6, n_customers), categories=[1, 2, 3, 4, 5]))
+
+    start = time.perf_counter()
+    expected = regex_segments(recency_score, frequency_score)
+    regex_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = assign_segments(recency_score, frequency_score)
+    lookup_seconds = time.perf_counter() - start
+
+    assert (result.astype(str) == expected).all()
+    print(f'{n_customers:>11,} customers | regex {regex_seconds:7.3f} s | lookup {lookup_seconds:7.3f} s | '
+          f'speedup {regex_seconds / lookup_seconds:6.1f}x')
+
+
+if __name__ == '__main__':
+    check_all_cells()
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000]
+    for n_customers in sizes:
+        run(n_customers)
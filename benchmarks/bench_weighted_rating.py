@@ -0,0 +1,83 @@
+##########################################################################
+# Benchmark: weighted_rating with masked means vs. bucketed_weighted_rating
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_weighted_rating            # 1M reviews
+#   python -m benchmarks.bench_weighted_rating 10000000
+#   python -m benchmarks.bench_weighted_rating 1000000 2000  # reviews, courses: weighted_rating per course
+#                                                            # vs. grouped_weighted_rating
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from helpers.rating import bucketed_weighted_rating, grouped_weighted_rating
+
+
+# the functions of 05_hafta_rating_products_application.py
+def time_based_weighted_average(dataframe, w1=0.28, w2=0.26, w3=0.24, w4=0.22):
+    return dataframe.loc[dataframe['days'] <= 30, 'rating'].mean() * w1 + \
+        dataframe.loc[(dataframe['days'] > 30) & (dataframe['days'] <= 90), 'rating'].mean() * w2 + \
+        dataframe.loc[(dataframe['days'] > 90) & (dataframe['days'] <= 180), 'rating'].mean() * w3 + \
+        dataframe.loc[dataframe['days'] > 180, 'rating'].mean() * w4
+
+
+def user_based_weighted_average(dataframe, w1=0.22, w2=0.24, w3=0.26, w4=0.28):
+    return dataframe.loc[(dataframe['progress'] <= 10), 'rating'].mean() * w1 + \
+        dataframe.loc[(dataframe['progress'] > 10) & (dataframe['progress'] <= 45), 'rating'].mean() * w2 + \
+        dataframe.loc[(dataframe['progress'] > 45) & (dataframe['progress'] <= 75), 'rating'].mean() * w3 + \
+        dataframe.loc[(dataframe['progress'] > 75), 'rating'].mean() * w4
+
+
+def weighted_rating(dataframe, time_w=0.50, user_w=0.50):
+    return time_based_weighted_average(dataframe) * time_w + user_based_weighted_average(dataframe) * user_w
+
+
+def make_reviews(n_reviews, n_courses=1, seed=42):
+    """course_reviews.csv style reviews with the days column of the script"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'course id': rng.integers(0, n_courses, n_reviews),
+                         'rating': rng.choice([1.0, 2.0, 3.0, 4.0, 4.5, 5.0], n_reviews,
+                                              p=[0.01, 0.01, 0.04, 0.14, 0.1, 0.7]),
+                         'progress': rng.integers(0, 101, n_reviews).astype('float64'),
+                         'days': rng.integers(0, 1500, n_reviews)})
+
+
+def run(n_reviews):
+    df = make_reviews(n_reviews)
+
+    start = time.perf_counter()
+    expected = weighted_rating(df)
+    masked_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    score = bucketed_weighted_rating(df)['weighted_rating']
+    bucketed_seconds = time.perf_counter() - start
+
+    np.testing.assert_allclose(score, expected, rtol=1e-12)
+    print(f'{n_reviews:>11,} reviews | masked means {masked_seconds:7.4f} s | bucketed {bucketed_seconds:7.4f} s | '
+          f'speedup {masked_seconds / bucketed_seconds:5.1f}x')
+
+
+def run_grouped(n_reviews, n_courses):
+    df = make_reviews(n_reviews, n_courses)
+
+    start = time.perf_counter()
+    expected = df.groupby('course id').apply(weighted_rating)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = grouped_weighted_rating(df, product='course id')['weighted_rating']
+    grouped_seconds = time.perf_counter() - start
+
+    np.testing.assert_allclose(scores, expected, rtol=1e-12)
+    print(f'{n_reviews:>11,} reviews, {n_courses:,} courses | per course {loop_seconds:7.2f} s | '
+          f'grouped {grouped_seconds:7.4f} s | speedup {loop_seconds / grouped_seconds:7.1f}x')
+
+
+if __name__ == '__main__':
+    n_reviews = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    if len(sys.argv) > 2:
+        run_grouped(n_reviews, int(sys.argv[2]))
+    else:
+        run(n_reviews)
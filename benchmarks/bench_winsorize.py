@@ -0,0 +1,53 @@
+##########################################################################
+# Benchmark: replace_with_thresholds per column vs. winsorize
+##########################################################################
+# usage (from the root of the repository):
+#   python -m benchmarks.bench_winsorize             # 1M customers
+#   python -m benchmarks.bench_winsorize 10000000
+
+import sys
+import time
+import pandas as pd
+from helpers.outliers import winsorize
+from benchmarks.synthetic import make_flo
+
+
+# replace_with_thresholds of the flo cltv script
+def outlier_thresholds(dataframe, variable, q1=0.05, q3=0.95):
+    quartile1 = dataframe[variable].quantile(q1)
+    quartile3 = dataframe[variable].quantile(q3)
+    interquartile_range = quartile3 - quartile1
+    up_level = quartile3 + 1.5 * interquartile_range
+    low_level = quartile1 - 1.5 * interquartile_range
+    return round(low_level), round(up_level)
+
+
+def replace_with_thresholds(dataframe, variable):
+    low_level, up_level = outlier_thresholds(dataframe, variable)
+    dataframe.loc[(dataframe[variable] < low_level, variable)] = low_level
+    dataframe.loc[(dataframe[variable] > up_level), variable] = up_level
+
+
+def run(n_customers):
+    df = make_flo(n_customers)
+    variables = [col for col in df.columns if 'ever' in col]
+
+    expected = df.copy()
+    start = time.perf_counter()
+    for col in variables:
+        replace_with_thresholds(expected, col)
+    loop_seconds = time.perf_counter() - start
+
+    result = df.copy()
+    start = time.perf_counter()
+    thresholds = winsorize(result, variables, rounding='limits')
+    winsorize_seconds = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(expected, result)
+    print(thresholds)
+    print(f'{n_customers:>11,} customers x {len(variables)} columns | per column {loop_seconds:6.3f} s | '
+          f'winsorize {winsorize_seconds:6.3f} s ({loop_seconds / winsorize_seconds:4.1f}x), same frame')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,124 @@
+##########################################################################
+# Synthetic online retail style invoice lines for the benchmarks
+##########################################################################
+
+import numpy as np
+import pandas as pd
+
+
+def make_invoices(n_rows, n_customers=None, lines_per_invoice=20, seed=42):
+    """
+    df = make_invoices(1_000_000)
+
+    returns a dataframe with the lower-cased columns of online_retail_II
+    (invoice, stockcode, quantity, invoicedate, price, customer id, country).
+    """
+    rng = np.random.default_rng(seed)
+    if n_customers is None:
+        n_customers = max(n_rows // 100, 10)
+    n_invoices = max(n_rows // lines_per_invoice, 1)
+
+    # every invoice belongs to a single customer and has a single date
+    invoice_customer = rng.integers(12346, 12346 + n_customers, n_invoices).astype('float64')
+    start = np.datetime64('2009-12-01T07:00', 'm')
+    invoice_minutes = rng.integers(0, 2 * 365 * 24 * 60, n_invoices)
+    invoice_dates = start + invoice_minutes.astype('timedelta64[m]')
+
+    invoice_of_line = np.sort(rng.integers(0, n_invoices, n_rows))
+    df = pd.DataFrame({
+        'invoice': (invoice_of_line + 489434).astype(str),
+        'stockcode': rng.integers(10000, 14000, n_rows).astype(str),
+        'quantity': rng.integers(1, 25, n_rows),
+        'invoicedate': invoice_dates[invoice_of_line].astype('datetime64[ns]'),
+        'price': rng.gamma(2.0, 2.0, n_rows).round(2),
+        'customer id': invoice_customer[invoice_of_line],
+        'country': rng.choice(['United Kingdom', 'France', 'Germany', 'EIRE', 'Spain'], n_rows)})
+
+    # some returns and some lines without a customer as in the real dataset
+    returns = rng.random(n_invoices) < 0.02
+    df.loc[returns[invoice_of_line], 'invoice'] = 'C' + df.loc[returns[invoice_of_line], 'invoice']
+    df.loc[rng.random(n_rows) < 0.05, 'customer id'] = np.nan
+    return df
+
+
+def make_lifetime_data(n_customers, seed=42):
+    """
+    cltv_df = make_lifetime_data(1_000_000)
+
+    returns the lifetime data structure of create_cltv_prediction (recency, T, frequency, monetary)
+    with recency and T as whole days divided by 7, as in the scripts.
+    """
+    rng = np.random.default_rng(seed)
+    T_days = rng.integers(30, 730, n_customers)
+    recency_days = (T_days * rng.beta(2.0, 1.0, n_customers)).astype('int64')
+    frequency = 2 + rng.poisson(3.0, n_customers)
+    monetary = rng.gamma(2.0, 150.0, n_customers).round(2)
+    return pd.DataFrame({'recency': recency_days / 7,
+                         'T': T_days / 7,
+                         'frequency': frequency,
+                         'monetary': monetary},
+                        index=pd.Index(np.arange(n_customers) + 12346.0, name='customer id'))
+
+
+def make_persona(n_rows, seed=42):
+    """
+    df = make_persona(1_000_000)
+
+    returns the columns of persona.csv (PRICE, SOURCE, SEX, COUNTRY, AGE)
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'PRICE': rng.choice([9, 19, 29, 39, 49, 59], n_rows),
+                         'SOURCE': rng.choice(['android', 'ios'], n_rows, p=[0.7, 0.3]),
+                         'SEX': rng.choice(['female', 'male'], n_rows),
+                         'COUNTRY': rng.choice(['bra', 'can', 'deu', 'fra', 'tur', 'usa'], n_rows),
+                         'AGE': rng.integers(15, 67, n_rows)})
+
+
+def make_flo(n_customers, seed=42):
+    """
+    df = make_flo(1_000_000)
+
+    returns the order and customer value columns of flo_rfm_analizi_dataset.csv, heavy-tailed
+    like the original (a few customers with many orders and large totals)
+    """
+    rng = np.random.default_rng(seed)
+    online = 1 + rng.negative_binomial(1, 0.35, n_customers)
+    offline = 1 + rng.negative_binomial(1, 0.5, n_customers)
+    return pd.DataFrame({'order_num_total_ever_online': online.astype('float64'),
+                         'order_num_total_ever_offline': offline.astype('float64'),
+                         'customer_value_total_ever_offline': (offline * rng.lognormal(4.8, 0.8, n_customers)).round(2),
+                         'customer_value_total_ever_online': (online * rng.lognormal(5.0, 0.9, n_customers)).round(2)})
+
+
+def make_rfm(n_customers, seed=42):
+    """
+    rfm = make_rfm(1_000_000)
+
+    returns the rfm metrics of create_rfm (recency in days, frequency in invoices, monetary),
+    indexed by customer id, with the ties of a whole-number frequency
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'recency': rng.integers(1, 740, n_customers),
+                         'frequency': 1 + rng.negative_binomial(1, 0.25, n_customers),
+                         'monetary': rng.lognormal(6.0, 1.1, n_customers).round(2)},
+                        index=pd.Index(np.arange(n_customers) + 12346, name='customer id'))
+
+
+def make_ab_tests(n_experiments, n_metrics=12, min_size=40, max_size=2000, seed=42):
+    """
+    long_df = make_ab_tests(300)
+
+    returns one row per observation (experiment, group, metric, value) of n_experiments a/b tests with
+    a control and a test group of random sizes; some metrics are skewed, some tests have an effect
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for experiment in range(n_experiments):
+        sizes = rng.integers(min_size, max_size, 2)
+        for metric in range(n_metrics):
+            skewed = metric % 3 == 0
+            for group, size, lift in [('control', sizes[0], 1.0), ('test', sizes[1], 1 + rng.choice([0, 0.05]))]:
+                values = rng.gamma(2.0, 50.0, size) if skewed else rng.normal(500.0, 80.0, size)
+                frames.append(pd.DataFrame({'experiment': experiment, 'group': group,
+                                            'metric': f'metric_{metric}', 'value': values * lift}))
+    return pd.concat(frames, ignore_index=True)
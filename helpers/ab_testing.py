@@ -0,0 +1,334 @@
+##########################################################################
+# A/B testing over many experiments and metrics
+##########################################################################
+# 06_hafta_comparing_conversion_of_bidding_methods_with_ab_testing.py runs
+# shapiro, levene and ttest_ind once per metric. ab_test_battery takes a
+# long table (experiment, group, metric, value) and runs the same decision
+# for every (experiment, metric) pair with array operations over the
+# whole table, sorted once:
+#   - normality of both groups: shapiro-wilk (royston's AS R94, as scipy)
+#   - variance homogeneity: levene with the median as center (as scipy)
+#   - both normal: ttest_ind, equal_var from levene; otherwise mannwhitneyu
+#   - t confidence intervals of both means and of the difference
+#
+# results = ab_test_battery(long_df, control='control', test='test')
+#
+# when the rows do not fit in one process, every shard keeps only the
+# sufficient statistics of its groups (n, sum, sum of squares, conversions)
+# and the t-tests, z-tests and intervals are computed from their sums:
+# stats = merge_stats(sufficient_stats(shard_1), sufficient_stats(shard_2))
+# results = ab_test_from_stats(stats)
+
+import numpy as np
+import pandas as pd
+from scipy.stats import f as f_distribution, norm, t as t_distribution
+
+# polynomial coefficients of AS R94, lowest degree first
+_SW_C1 = [0.0, 0.221157, -0.147981, -2.071190, 4.434685, -2.706056]
+_SW_C2 = [0.0, 0.042981, -0.293762, -1.752461, 5.682633, -3.582633]
+_SW_C3 = [0.5440, -0.39978, 0.025054, -6.714e-4]
+_SW_C4 = [1.3822, -0.77857, 0.062767, -0.0020322]
+_SW_C5 = [-1.5861, -0.31082, -0.083751, 0.0038915]
+_SW_C6 = [-0.4803, -0.082676, 0.0030302]
+_SW_G = [-2.273, 0.459]
+
+
+def _poly(coefficients, x):
+    return np.polynomial.polynomial.polyval(x, coefficients)
+
+
+def shapiro_coefficients(n):
+    """the n // 2 shapiro-wilk coefficients of a sample of size n (n >= 3), largest first"""
+    if n == 3:
+        return np.array([np.sqrt(0.5)])
+    m = norm.ppf((np.arange(1, n // 2 + 1) - 0.375) / (n + 0.25))
+    summ2 = 2 * np.sum(m * m)
+    ssumm2 = np.sqrt(summ2)
+    rsn = 1 / np.sqrt(n)
+    a = -m / ssumm2
+    a[0] = _poly(_SW_C1, rsn) - m[0] / ssumm2
+    if n > 5:
+        a[1] = _poly(_SW_C2, rsn) - m[1] / ssumm2
+        fac = np.sqrt((summ2 - 2 * m[0] ** 2 - 2 * m[1] ** 2) / (1 - 2 * a[0] ** 2 - 2 * a[1] ** 2))
+        a[2:] = -m[2:] / fac
+    else:
+        fac = np.sqrt((summ2 - 2 * m[0] ** 2) / (1 - 2 * a[0] ** 2))
+        a[1:] = -m[1:] / fac
+    return a
+
+
+def shapiro_batch(samples):
+    """
+    w, pvalue = shapiro_batch(samples)
+
+    shapiro-wilk statistic and p-value of every row of a 2-D array of samples of the same size,
+    same as scipy.stats.shapiro per row (w within 1e-8)
+    """
+    samples = np.sort(np.asarray(samples, dtype='float64'), axis=1)
+    n = samples.shape[1]
+    # centered on a middle value as in scipy, for the precision of the sums of squares
+    samples = samples - samples[:, [n // 2]]
+    a = shapiro_coefficients(n)
+    half = n // 2
+    numerator = ((samples[:, ::-1][:, :half] - samples[:, :half]) @ a) ** 2
+    denominator = np.sum((samples - samples.mean(axis=1, keepdims=True)) ** 2, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.minimum(numerator / denominator, 1.0)
+    return w, _shapiro_pvalue(w, n)
+
+
+def _shapiro_pvalue(w, n):
+    if n == 3:
+        return np.maximum(6 / np.pi * (np.arcsin(np.sqrt(w)) - np.arcsin(np.sqrt(0.75))), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = np.log(1 - w)
+        if n <= 11:
+            gamma = _poly(_SW_G, n)
+            small = y >= gamma
+            y = -np.log(gamma - np.where(small, gamma - 1, y))
+            pvalue = norm.sf((y - _poly(_SW_C3, n)) / np.exp(_poly(_SW_C4, n)))
+            return np.where(small, 1e-99, pvalue)
+        log_n = np.log(n)
+        return norm.sf((y - _poly(_SW_C5, log_n)) / np.exp(_poly(_SW_C6, log_n)))
+
+
+def mean_confint(n, mean, var, confidence=0.95):
+    """t confidence interval of the mean, as sms.DescrStatsW(values).tconfint_mean()"""
+    half_width = t_distribution.ppf((1 + confidence) / 2, n - 1) * np.sqrt(var / n)
+    return mean - half_width, mean + half_width
+
+
+def t_tests(n1, mean1, var1, n2, mean2, var2):
+    """
+    student (equal_var=True) and welch t-tests of mean1 - mean2 from the group sizes, means and
+    variances (ddof=1), as ttest_ind(group1, group2): a dict of statistic, pvalue, df and standard error
+    """
+    n1, n2 = np.asarray(n1, dtype='float64'), np.asarray(n2, dtype='float64')
+    diff = np.asarray(mean1, dtype='float64') - np.asarray(mean2, dtype='float64')
+    se1, se2 = np.asarray(var1, dtype='float64') / n1, np.asarray(var2, dtype='float64') / n2
+
+    student_df = n1 + n2 - 2
+    pooled = ((n1 - 1) * var1 + (n2 - 1) * var2) / student_df
+    student_se = np.sqrt(pooled * (1 / n1 + 1 / n2))
+    welch_se = np.sqrt(se1 + se2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        welch_df = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+        student_stat, welch_stat = diff / student_se, diff / welch_se
+    return {'student': {'statistic': student_stat, 'pvalue': 2 * t_distribution.sf(np.abs(student_stat), student_df),
+                        'df': student_df, 'se': student_se},
+            'welch': {'statistic': welch_stat, 'pvalue': 2 * t_distribution.sf(np.abs(welch_stat), welch_df),
+                      'df': welch_df, 'se': welch_se}}
+
+
+def _stable_order(keys, order, n_keys):
+    # order stably sorted by the integer keys; small integer dtypes are radix sorted
+    dtype = 'uint16' if n_keys <= np.iinfo('uint16').max else 'int64'
+    return order[np.argsort(keys[order].astype(dtype), kind='stable')]
+
+
+def _average_ranks(pairs, values, n_pairs, order):
+    # ranks of the values within their pair (ties get the average rank), and the tie correction sum(t^3 - t).
+    # order sorts the rows by pair and value
+    sorted_pairs, sorted_values = pairs[order], values[order]
+    new_tie = np.ones(len(order), dtype=bool)
+    new_tie[1:] = (sorted_pairs[1:] != sorted_pairs[:-1]) | (sorted_values[1:] != sorted_values[:-1])
+    tie_ids = np.cumsum(new_tie) - 1
+    tie_sizes = np.bincount(tie_ids)
+    tie_starts = np.flatnonzero(new_tie)
+    pair_sizes = np.bincount(sorted_pairs, minlength=n_pairs)
+    pair_starts = np.repeat(np.cumsum(pair_sizes) - pair_sizes, pair_sizes)
+    ranks = np.empty(len(order))
+    ranks[order] = tie_starts[tie_ids] + (tie_sizes[tie_ids] + 1) / 2 - pair_starts
+    tie_pairs = sorted_pairs[tie_starts]
+    tie_terms = np.bincount(tie_pairs, weights=tie_sizes.astype('float64') ** 3 - tie_sizes, minlength=n_pairs)
+    return ranks, tie_terms
+
+
+def _mannwhitneyu(pairs, is_test, values, n_pairs, n1, n2, order):
+    # two-sided mannwhitneyu of control vs. test with the normal approximation and continuity correction
+    ranks, tie_terms = _average_ranks(pairs, values, n_pairs, order)
+    rank_sum = np.bincount(pairs[~is_test], weights=ranks[~is_test], minlength=n_pairs)
+    u1 = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    u = np.maximum(u1, n1 * n2 - u1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - tie_terms / (n * (n - 1))))
+        z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return u1, np.clip(2 * norm.sf(z), 0, 1)
+
+
+def ab_test_battery(dataframe, experiment='experiment', group='group', metric='metric', value='value',
+                    control='control', test='test', alpha=0.05, confidence=0.95):
+    """
+    results = ab_test_battery(long_df)
+
+    the tests of the a/b testing script for every (experiment, metric) pair of a long table with one
+    row per observation. both groups need at least 3 values (shapiro); missing values are dropped.
+    the test of a pair is chosen as in the script:
+    - both groups normal (shapiro p >= alpha): ttest_ind with equal_var = (levene p >= alpha),
+      'ttest' or 'welch'
+    - otherwise 'mannwhitneyu' (normal approximation with continuity correction)
+    statistic is that of ttest_ind(control, test) or the U of the control group. diff is
+    mean_test - mean_control with the student or welch confidence interval.
+    returns one row per pair: group sizes, means and their confidence intervals, shapiro p-values
+    of both groups, levene statistic and p-value, the chosen test with its statistic and p-value,
+    diff with its confidence interval and significant (pvalue < alpha).
+    """
+    data = dataframe.loc[dataframe[group].isin([control, test]) & dataframe[value].notna(),
+                         [experiment, metric, group, value]]
+    grouped = data.groupby([experiment, metric], sort=True)
+    pairs = grouped.ngroup().to_numpy()
+    keys = grouped.size().index
+    n_pairs = len(keys)
+    is_test = (data[group] == test).to_numpy()
+    values = data[value].to_numpy(dtype='float64')
+
+    # one sort of the values, then stable sorts by pair (for the ranks) and by cell (pair, group),
+    # 2 * pair + is_test, so that the values are sorted within every pair and every cell
+    cells = 2 * pairs + is_test
+    pair_order = _stable_order(pairs, np.argsort(values), n_pairs)
+    order = _stable_order(cells, pair_order, 2 * n_pairs)
+    sorted_values = values[order]
+    counts = np.bincount(cells, minlength=2 * n_pairs)
+    if counts.min() < 3:
+        short = keys[np.flatnonzero(counts.reshape(-1, 2).min(axis=1) < 3)]
+        raise ValueError(f'both groups need at least 3 values, not the case for {list(short)[:5]}')
+    starts = np.cumsum(counts) - counts
+    means = np.bincount(cells, weights=values) / counts
+    variances = np.bincount(cells, weights=(values - means[cells]) ** 2) / (counts - 1)
+
+    # levene: one-way anova of the absolute deviations from the group medians
+    medians = (sorted_values[starts + (counts - 1) // 2] + sorted_values[starts + counts // 2]) / 2
+    deviations = np.abs(values - medians[cells])
+    deviation_means = np.bincount(cells, weights=deviations) / counts
+    within = np.bincount(cells, weights=(deviations - deviation_means[cells]) ** 2).reshape(-1, 2).sum(axis=1)
+    n_cells = counts.reshape(-1, 2)
+    total = n_cells.sum(axis=1)
+    overall = (deviation_means.reshape(-1, 2) * n_cells).sum(axis=1) / total
+    between = (n_cells * (deviation_means.reshape(-1, 2) - overall[:, None]) ** 2).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        levene_stat = (total - 2) * between / within
+    levene_p = f_distribution.sf(levene_stat, 1, total - 2)
+
+    # shapiro: one batch per group size
+    shapiro_p = np.empty(2 * n_pairs)
+    for size in np.unique(counts):
+        batch = np.flatnonzero(counts == size)
+        _, shapiro_p[batch] = shapiro_batch(sorted_values[starts[batch, None] + np.arange(size)])
+
+    n1, n2 = n_cells[:, 0].astype('float64'), n_cells[:, 1].astype('float64')
+    mean1, mean2 = means.reshape(-1, 2).T
+    var1, var2 = variances.reshape(-1, 2).T
+    tests = t_tests(n1, mean1, var1, n2, mean2, var2)
+    u1, u_pvalue = _mannwhitneyu(pairs, is_test, values, n_pairs, n1, n2, pair_order)
+
+    normal = (shapiro_p.reshape(-1, 2) >= alpha).all(axis=1)
+    equal_var = levene_p >= alpha
+    chosen = np.where(normal, np.where(equal_var, 'ttest', 'welch'), 'mannwhitneyu')
+    statistic = np.where(normal, np.where(equal_var, tests['student']['statistic'], tests['welch']['statistic']), u1)
+    pvalue = np.where(normal, np.where(equal_var, tests['student']['pvalue'], tests['welch']['pvalue']), u_pvalue)
+
+    # the difference test - control with the interval of the student or welch test
+    use_student = normal & equal_var
+    diff_se = np.where(use_student, tests['student']['se'], tests['welch']['se'])
+    diff_df = np.where(use_student, tests['student']['df'], tests['welch']['df'])
+    half_width = t_distribution.ppf((1 + confidence) / 2, diff_df) * diff_se
+    ci_low, ci_high = mean_confint(counts, means, variances, confidence)
+
+    results = pd.DataFrame({
+        'n_control': n_cells[:, 0], 'n_test': n_cells[:, 1], 'mean_control': mean1, 'mean_test': mean2,
+        'ci_low_control': ci_low[0::2], 'ci_high_control': ci_high[0::2],
+        'ci_low_test': ci_low[1::2], 'ci_high_test': ci_high[1::2],
+        'shapiro_p_control': shapiro_p[0::2], 'shapiro_p_test': shapiro_p[1::2],
+        'levene_stat': levene_stat, 'levene_p': levene_p,
+        'test': chosen, 'statistic': statistic, 'pvalue': pvalue,
+        'diff': mean2 - mean1, 'diff_ci_low': mean2 - mean1 - half_width, 'diff_ci_high': mean2 - mean1 + half_width,
+        'significant': pvalue < alpha}, index=keys)
+    return results.reset_index()
+
+
+def sufficient_stats(dataframe, keys=('experiment', 'metric'), group='group', value='value',
+                     conversions=None, trials=None):
+    """
+    n, sum and sum of squares of value per (keys, group), the summary a shard sends instead of its rows.
+    conversions: column of conversion counts (e.g. a 0/1 purchase flag) summed per group, with the number
+    of trials from the trials column (or n). the summaries of shards are combined with merge_stats.
+    """
+    # one groupby over all the sums, the keys are factorized once
+    values = dataframe[value]
+    columns = {'n': values.notna(), 'sum': values, 'sumsq': values * values}
+    if conversions is not None:
+        columns['conversions'] = dataframe[conversions]
+        columns['trials'] = values.notna() if trials is None else dataframe[trials]
+    by = [dataframe[key] for key in [*keys, group]]
+    stats = pd.DataFrame(columns).groupby(by, sort=True).sum()
+    stats['n'] = stats['n'].astype('int64')
+    return stats.reset_index()
+
+
+def merge_stats(*stats, keys=('experiment', 'metric'), group='group'):
+    """sum of the sufficient statistics of several shards, per (keys, group)"""
+    return pd.concat(stats).groupby([*keys, group], sort=True).sum().reset_index()
+
+
+def ab_test_from_stats(stats, keys=('experiment', 'metric'), group='group', control='control', test='test',
+                       equal_var=False, alpha=0.05, confidence=0.95):
+    """
+    results = ab_test_from_stats(stats)
+
+    t-tests and confidence intervals of every (keys) pair from the sufficient statistics of the control
+    and test groups (columns n, sum, sumsq as in sufficient_stats), without the rows:
+    mean = sum / n, var = (sumsq - sum ** 2 / n) / (n - 1). the variance loses precision when the
+    mean is more than about 1e6 times the standard deviation; shift such values before summing.
+    equal_var=True: student t-test as ttest_ind(control, test), False: welch. there is no normality or
+    levene check, they need the rows. diff is mean_test - mean_control with its confidence interval.
+    with conversions and trials columns the conversion rates are compared with the two-proportion z-test
+    (pooled, as proportions_ztest) and wald confidence intervals.
+    """
+    keys = list(keys)
+    table = stats.set_index([*keys, group])
+    both = table.xs(control, level=group).join(table.xs(test, level=group), how='inner',
+                                               lsuffix='_control', rsuffix='_test')
+    n1, n2 = both['n_control'].to_numpy(dtype='float64'), both['n_test'].to_numpy(dtype='float64')
+    mean1, mean2 = both['sum_control'].to_numpy() / n1, both['sum_test'].to_numpy() / n2
+    var1 = np.maximum(both['sumsq_control'].to_numpy() - n1 * mean1 ** 2, 0) / (n1 - 1)
+    var2 = np.maximum(both['sumsq_test'].to_numpy() - n2 * mean2 ** 2, 0) / (n2 - 1)
+
+    chosen = t_tests(n1, mean1, var1, n2, mean2, var2)['student' if equal_var else 'welch']
+    half_width = t_distribution.ppf((1 + confidence) / 2, chosen['df']) * chosen['se']
+    ci_low1, ci_high1 = mean_confint(n1, mean1, var1, confidence)
+    ci_low2, ci_high2 = mean_confint(n2, mean2, var2, confidence)
+    results = pd.DataFrame({
+        'n_control': both['n_control'], 'n_test': both['n_test'], 'mean_control': mean1, 'mean_test': mean2,
+        'std_control': np.sqrt(var1), 'std_test': np.sqrt(var2),
+        'ci_low_control': ci_low1, 'ci_high_control': ci_high1, 'ci_low_test': ci_low2, 'ci_high_test': ci_high2,
+        'test': 'ttest' if equal_var else 'welch', 'statistic': chosen['statistic'], 'pvalue': chosen['pvalue'],
+        'diff': mean2 - mean1, 'diff_ci_low': mean2 - mean1 - half_width, 'diff_ci_high': mean2 - mean1 + half_width,
+        'significant': chosen['pvalue'] < alpha}, index=both.index)
+
+    if 'conversions_control' in both:
+        results = results.join(_proportion_tests(both, alpha, confidence))
+    return results.reset_index()
+
+
+def _proportion_tests(both, alpha, confidence):
+    # two-proportion z-test of control - test (pooled) and wald intervals of the rates (clipped to [0, 1]
+    # as proportion_confint) and of test - control
+    c1, c2 = both['conversions_control'].to_numpy(dtype='float64'), both['conversions_test'].to_numpy(dtype='float64')
+    t1, t2 = both['trials_control'].to_numpy(dtype='float64'), both['trials_test'].to_numpy(dtype='float64')
+    rate1, rate2 = c1 / t1, c2 / t2
+    pooled = (c1 + c2) / (t1 + t2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = (rate1 - rate2) / np.sqrt(pooled * (1 - pooled) * (1 / t1 + 1 / t2))
+    z_pvalue = 2 * norm.sf(np.abs(z))
+    quantile = norm.ppf((1 + confidence) / 2)
+    se1, se2 = np.sqrt(rate1 * (1 - rate1) / t1), np.sqrt(rate2 * (1 - rate2) / t2)
+    diff_se = np.sqrt(se1 ** 2 + se2 ** 2)
+    low1, high1 = np.clip(rate1 - quantile * se1, 0, 1), np.clip(rate1 + quantile * se1, 0, 1)
+    low2, high2 = np.clip(rate2 - quantile * se2, 0, 1), np.clip(rate2 + quantile * se2, 0, 1)
+    return pd.DataFrame({
+        'rate_control': rate1, 'rate_test': rate2,
+        'rate_ci_low_control': low1, 'rate_ci_high_control': high1, 'rate_ci_low_test': low2, 'rate_ci_high_test': high2,
+        'z_statistic': z, 'z_pvalue': z_pvalue, 'rate_diff': rate2 - rate1,
+        'rate_diff_ci_low': rate2 - rate1 - quantile * diff_se, 'rate_diff_ci_high': rate2 - rate1 + quantile * diff_se,
+        'rate_significant': z_pvalue < alpha}, index=both.index)
@@ -0,0 +1,221 @@
+##########################################################################
+# CLTV scoring with fitted BG-NBD and Gamma-Gamma models
+##########################################################################
+# create_cltv_prediction calls bgf.predict once per horizon, then
+# conditional_expected_average_profit and customer_lifetime_value, all
+# single-threaded over the whole customer frame. score_cltv computes all
+# of them for a shard of customers in one pass, and score_cltv_parallel
+# shards the customers over a process pool that shares the fitted params.
+# the workers read the customer columns from shared memory and write the
+# scores into shared memory, so no frame is pickled to or from them.
+#
+# scores = score_cltv_parallel(bgf, ggf, cltv_df, n_jobs=8)
+# cltv_df = cltv_df.join(scores)
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+import numpy as np
+import pandas as pd
+from scipy.special import hyp2f1
+from lifetimes import BetaGeoFitter, GammaGammaFitter
+
+# horizons of create_cltv_prediction in weeks
+HORIZONS = {'expected_purc_1_week': 1,
+            'expected_purc_1_month': 4,
+            'expected_purc_3_month': 12}
+
+# periods per month of customer_lifetime_value in lifetimes
+CLV_FACTORS = {'W': 4.345, 'M': 1.0, 'D': 30, 'H': 30 * 24}
+
+
+def compress_lifetime_data(dataframe, columns=('frequency', 'recency', 'T')):
+    """
+    compact, inverse = compress_lifetime_data(cltv_df)
+
+    collapses the customers into the unique rows of columns with a 'weights' column (number of customers).
+    the models fitted on compact with weights=compact['weights'] have the same likelihood as on all
+    customers, and compact scores go back to the customers with scores[inverse].
+    """
+    grouped = dataframe.groupby(list(columns), sort=False)
+    inverse = grouped.ngroup().to_numpy()
+    compact = grouped.size().rename('weights').reset_index()
+    return compact, inverse
+
+
+def expected_purchases(bgf_params, t, frequency, recency, T):
+    """
+    purchases = expected_purchases(bgf.params_, [1, 4, 12], frequency, recency, T)
+
+    customers x horizons matrix of bgf.conditional_expected_number_of_purchases_up_to_time (bgf.predict).
+    the terms that only depend on the customer are computed once, and the hypergeometric terms,
+    which only depend on (frequency, T) and t, are computed once per distinct (frequency, T) pair
+    for all horizons in a single vectorized hyp2f1 call.
+    """
+    r, alpha, a, b = [bgf_params[param] for param in ['r', 'alpha', 'a', 'b']]
+    t = np.atleast_1d(np.asarray(t, dtype='float64'))
+    x = np.asarray(frequency, dtype='float64')
+    recency = np.asarray(recency, dtype='float64')
+    T = np.asarray(T, dtype='float64')
+
+    # distinct (frequency, T) pairs by hashing; weekly T is heavily quantized
+    x_codes, x_values = pd.factorize(x)
+    T_codes, T_values = pd.factorize(T)
+    inverse, pairs = pd.factorize(x_codes.astype('int64') * len(T_values) + T_codes)
+    ux = x_values[pairs // len(T_values)][:, None]
+    uT = T_values[pairs % len(T_values)][:, None]
+
+    _a = r + ux
+    _b = b + ux
+    _c = a + b + ux - 1
+    _z = t / (alpha + uT + t)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ln_hyp_term = np.log(hyp2f1(_a, _b, _c, _z))
+
+        # if the value is inf, the equivalent formula of lifetimes is used for those cells only
+        inf = np.isinf(ln_hyp_term)
+        if inf.any():
+            rows, cols = np.nonzero(inf)
+            _a, _b, _c, _z = _a[rows, 0], _b[rows, 0], _c[rows, 0], _z[rows, cols]
+            ln_hyp_term[rows, cols] = (np.log(hyp2f1(_c - _a, _c - _b, _c, _z))
+                                       + (_c - _a - _b) * np.log(1 - _z))
+
+    second_term = 1 - np.exp(ln_hyp_term + (r + ux) * np.log((alpha + uT) / (alpha + t + uT)))
+
+    first_term = (a + b + x - 1) / (a - 1)
+    denominator = 1 + (x > 0) * (a / (b + x - 1)) * ((alpha + T) / (alpha + recency)) ** (r + x)
+    return (first_term / denominator)[:, None] * second_term[inverse]
+
+
+def predict_horizons(bgf, horizons, frequency, recency, T):
+    """
+    predict_horizons(bgf, {'expected_purc_3_month': 12, 'expected_purc_6_month': 24}, frequency, recency, T)
+
+    expected purchases for a list of horizons (or a dict of column name: horizon) as a customers x horizons frame
+    """
+    names, t = _horizon_items(horizons)
+    purchases = expected_purchases(bgf.params_, t, frequency, recency, T)
+    return pd.DataFrame(purchases, index=getattr(frequency, 'index', None), columns=names)
+
+
+def _horizon_items(horizons):
+    # column names and horizons of a list of horizons (named by themselves) or a dict of column name: horizon
+    names = list(horizons)
+    return names, list(horizons.values()) if isinstance(horizons, dict) else names
+
+
+def fitters_from_params(bgf_params, ggf_params):
+    """fitted BetaGeoFitter and GammaGammaFitter rebuilt from their params_ (for scoring only)"""
+    bgf = BetaGeoFitter()
+    bgf.params_ = bgf_params
+    bgf.predict = bgf.conditional_expected_number_of_purchases_up_to_time
+    ggf = GammaGammaFitter()
+    ggf.params_ = ggf_params
+    return bgf, ggf
+
+
+def score_cltv(bgf, ggf, cltv_df, horizons=HORIZONS, month=3, freq='W', discount_rate=0.01,
+               columns=('frequency', 'recency', 'T', 'monetary')):
+    """
+    expected purchases for every horizon (a list or a dict as in predict_horizons), expected_average_profit
+    and clv of the customers in cltv_df, with the same values as the separate calls in create_cltv_prediction.
+    the horizons and the monthly steps of the clv are predicted together in one expected_purchases call.
+    """
+    scores = _score_arrays(bgf, ggf, *[cltv_df[col].to_numpy() for col in columns],
+                           horizons=horizons, month=month, freq=freq, discount_rate=discount_rate)
+    return pd.DataFrame(scores, index=cltv_df.index, columns=_score_columns(horizons))
+
+
+def _score_columns(horizons):
+    return [*_horizon_items(horizons)[0], 'expected_average_profit', 'clv']
+
+
+def _score_arrays(bgf, ggf, frequency, recency, T, monetary, horizons, month, freq, discount_rate, out=None):
+    # customers x (horizons, expected_average_profit, clv) array of score_cltv, written into out if given
+    # clv of lifetimes: discounted purchases of every month, with cumulative predictions at i and i - factor
+    factor = CLV_FACTORS[freq]
+    steps = np.arange(1, month + 1) * factor
+    times, positions = np.unique(np.concatenate([_horizon_items(horizons)[1], steps, steps - factor]),
+                                 return_inverse=True)
+    purchases = expected_purchases(bgf.params_, times, frequency, recency, T)
+    horizon_cols = positions[:len(horizons)]
+    step_cols = positions[len(horizons):len(horizons) + month]
+    previous_cols = positions[len(horizons) + month:]
+
+    n_horizons = len(horizons)
+    if out is None:
+        out = np.empty((len(purchases), n_horizons + 2))
+    out[:, :n_horizons] = purchases[:, horizon_cols]
+    out[:, n_horizons] = ggf.conditional_expected_average_profit(frequency, monetary)
+
+    monthly = purchases[:, step_cols] - purchases[:, previous_cols]
+    discount = (1 + discount_rate) ** (steps / factor)
+    out[:, n_horizons + 1] = ((out[:, [n_horizons]] * monthly) / discount).sum(axis=1)
+    return out
+
+
+def usable_cores():
+    """number of cores this process may run on (the affinity mask where the platform has one)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# fitted models and shared input / output arrays of a worker process, set once by the pool initializer
+_worker_state = None
+
+
+def _init_worker(bgf_params, ggf_params, input_name, output_name, n_customers, n_scores):
+    global _worker_state
+    inputs = shared_memory.SharedMemory(name=input_name)
+    outputs = shared_memory.SharedMemory(name=output_name)
+    _worker_state = {'fitters': fitters_from_params(bgf_params, ggf_params),
+                     'memory': (inputs, outputs),
+                     'inputs': np.ndarray((4, n_customers), dtype='float64', buffer=inputs.buf),
+                     'outputs': np.ndarray((n_customers, n_scores), dtype='float64', buffer=outputs.buf)}
+
+
+def _score_shard(start, end, kwargs):
+    bgf, ggf = _worker_state['fitters']
+    _score_arrays(bgf, ggf, *_worker_state['inputs'][:, start:end], **kwargs,
+                  out=_worker_state['outputs'][start:end])
+
+
+def score_cltv_parallel(bgf, ggf, cltv_df, n_jobs=None, n_shards=None, horizons=HORIZONS, month=3, freq='W',
+                        discount_rate=0.01, columns=('frequency', 'recency', 'T', 'monetary')):
+    """
+    score_cltv over a process pool: the customers are split into n_shards partitions
+    (default: n_jobs) and the fitted params are sent to every worker once. the customer columns
+    (as float64) and the scores are shared memory blocks that every worker reads and writes its rows of.
+    n_jobs=None uses the usable cores; with one job or one usable core the customers are scored in
+    the current process, where a pool can only add the cost of starting it.
+    where processes are spawned (windows, macos) the calling script needs an if __name__ == '__main__' guard.
+    """
+    kwargs = {'horizons': horizons, 'month': month, 'freq': freq, 'discount_rate': discount_rate}
+    n_jobs = min(n_jobs or usable_cores(), usable_cores())
+    if n_jobs == 1 or len(cltv_df) < 2:
+        return score_cltv(bgf, ggf, cltv_df, columns=columns, **kwargs)
+
+    n_customers, n_scores = len(cltv_df), len(horizons) + 2
+    inputs = shared_memory.SharedMemory(create=True, size=4 * n_customers * 8)
+    outputs = shared_memory.SharedMemory(create=True, size=n_customers * n_scores * 8)
+    try:
+        shared_inputs = np.ndarray((4, n_customers), dtype='float64', buffer=inputs.buf)
+        for row, col in zip(shared_inputs, columns):
+            row[:] = cltv_df[col].to_numpy(dtype='float64')
+
+        n_shards = n_shards or n_jobs
+        bounds = np.linspace(0, n_customers, n_shards + 1).astype(int)
+        shards = [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(bgf.params_, ggf.params_, inputs.name, outputs.name,
+                                           n_customers, n_scores)) as executor:
+            list(executor.map(_score_shard, *zip(*shards), [kwargs] * len(shards)))
+
+        scores = np.ndarray((n_customers, n_scores), dtype='float64', buffer=outputs.buf).copy()
+    finally:
+        inputs.close()
+        inputs.unlink()
+        outputs.close()
+        outputs.unlink()
+    return pd.DataFrame(scores, index=cltv_df.index, columns=_score_columns(horizons))
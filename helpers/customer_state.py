@@ -0,0 +1,111 @@
+##########################################################################
+# Incremental (append-only) customer state for RFM and CLTV
+##########################################################################
+# instead of rerunning create_rfm / create_cltv_prediction on the whole
+# history every night, a per-customer state (first and last purchase date,
+# invoice count, monetary sum) is persisted and updated with the new
+# invoices only. recency, tenure etc. are derived from the state for any
+# today_date.
+#
+# state = build_state(prepare_invoices(history))
+# state = update_state(state, prepare_invoices(new_day))
+# save_state(state, 'rfm_state.pkl')
+# rfm = rfm_from_state(load_state('rfm_state.pkl'), dt.datetime(2011, 12, 12))
+
+import numpy as np
+import pandas as pd
+from helpers.outliers import winsorize
+
+STATE_COLUMNS = ['first_date', 'last_date', 'frequency', 'monetary']
+
+
+def build_state(dataframe, customer='customer id'):
+    """per-customer state of prepared invoice lines ('total_price' must already exist)"""
+    state = dataframe.groupby(customer).agg(
+        first_date=('invoicedate', 'min'),
+        last_date=('invoicedate', 'max'),
+        frequency=('invoice', 'nunique'),
+        monetary=('total_price', 'sum'))
+    return state
+
+
+def update_state(state, delta, customer='customer id'):
+    """
+    folds a delta batch of prepared invoice lines into the state.
+
+    the batch is append-only: its invoices must not be in the state already,
+    otherwise they are counted twice in frequency. the rows of the existing
+    customers are updated in place.
+    """
+    delta_state = build_state(delta, customer)
+    if delta_state.empty:
+        return state
+
+    # customers seen before: only their rows are touched
+    existing = delta_state.index[delta_state.index.isin(state.index)]
+    if len(existing):
+        old = state.loc[existing]
+        new = delta_state.loc[existing]
+        state.loc[existing, 'first_date'] = np.minimum(old['first_date'], new['first_date'])
+        state.loc[existing, 'last_date'] = np.maximum(old['last_date'], new['last_date'])
+        state.loc[existing, 'frequency'] = old['frequency'] + new['frequency']
+        state.loc[existing, 'monetary'] = old['monetary'] + new['monetary']
+
+    # new customers are appended
+    new_customers = delta_state.index.difference(existing)
+    if len(new_customers):
+        state = pd.concat([state, delta_state.loc[new_customers, STATE_COLUMNS]])
+        state.index.name = customer
+    return state
+
+
+def save_state(state, path):
+    state.to_pickle(path)
+
+
+def load_state(path):
+    return pd.read_pickle(path)
+
+
+def rfm_from_state(state, today_date):
+    """same output as rfm_metrics on the whole history"""
+    state = state.sort_index()
+    rfm = pd.DataFrame({'recency': (today_date - state['last_date']).dt.days,
+                        'frequency': state['frequency'].astype('int64'),
+                        'monetary': state['monetary']})
+    return rfm
+
+
+def cltv_from_state(state, today_date):
+    """
+    same lifetime data structure as create_cltv_prediction: recency and T in weeks,
+    frequency > 1 and monetary as the average value per purchase
+    """
+    state = state.sort_index()
+    cltv_df = pd.DataFrame({'recency': (state['last_date'] - state['first_date']).dt.days,
+                            'T': (today_date - state['first_date']).dt.days,
+                            'frequency': state['frequency'].astype('int64'),
+                            'monetary': state['monetary']})
+    cltv_df['monetary'] = cltv_df['monetary'] / cltv_df['frequency']
+    cltv_df = cltv_df[(cltv_df['frequency'] > 1)]
+    cltv_df['recency'] = cltv_df['recency'] / 7
+    cltv_df['T'] = cltv_df['T'] / 7
+    return cltv_df
+
+
+def prepare_cltv_invoices(dataframe, thresholds):
+    """
+    data preparation of create_cltv_prediction with fixed outlier thresholds,
+    e.g. thresholds = {'quantity': (low, up), 'price': (low, up)} computed once on the history
+    (or the thresholds frame returned by winsorize).
+    the thresholds of create_cltv_prediction depend on the whole history, so they are
+    frozen here to keep the state append-only.
+    """
+    dataframe = dataframe.dropna()
+    dataframe = dataframe[~dataframe['invoice'].str.contains('C', na=False)]
+    dataframe = dataframe[dataframe['quantity'] > 0]
+    dataframe = dataframe[dataframe['price'] > 0].copy()
+    columns = list(thresholds.index if isinstance(thresholds, pd.DataFrame) else thresholds)
+    winsorize(dataframe, columns, rounding='replacement', limits=thresholds)
+    dataframe['total_price'] = dataframe['quantity'] * dataframe['price']
+    return dataframe
@@ -0,0 +1,200 @@
+##########################################################################
+# Exploratory data analysis
+##########################################################################
+# the check_df / check_dataframe / grab_col_names functions of the scripts
+# call head, info, isnull().sum(), describe and nunique separately, and
+# nunique twice per column in grab_col_names, each a scan of the frame.
+# profile computes the dtype, null count, cardinality and quantiles of a
+# column from one factorize (non-numeric) or one sort (numeric), and
+# check_df / grab_col_names only read the profile.
+#
+# eda.check_df(df)
+# cat_cols, num_cols, cat_but_car = eda.grab_col_names(df)
+#
+# with sample=100_000 the profile is computed on a random sample of the
+# rows (null counts are scaled, cardinalities are lower bounds).
+#
+# with cardinality='hll' the number of unique values of the datetime
+# columns with more than SKETCH_MIN_UNIQUE values (estimated from a probe
+# of the rows) comes from a HyperLogLog sketch instead of a factorize,
+# whose hash table grows with the cardinality. the mode is limited to
+# these columns; the others keep their exact count, which is cheaper:
+# strings are hashed through a factorize in pandas anyway, numeric columns
+# take one sort (faster than hashing them), and a factorize of fewer
+# distinct values is faster than the sketch:
+# cat_cols, num_cols, cat_but_car = eda.grab_col_names(df, cardinality='hll', error=0.01)
+
+import numpy as np
+import pandas as pd
+from helpers.sketches import HyperLogLog
+
+QUANTILES = [0.05, 0.1, 0.25, 0.50, 0.75, 0.90, 0.95, 0.99]
+N_PROBE = 65536
+SKETCH_MIN_UNIQUE = 1_000_000
+
+
+def _is_object(dtype):
+    # string columns are 'object' in the scripts; pandas can also read them as the string dtype
+    return dtype == 'O' or isinstance(dtype, pd.StringDtype)
+
+
+def _labels(quantiles):
+    # column names of the quantiles as in describe: 0.05 -> '5%'
+    return [f'{q * 100:g}%' for q in quantiles]
+
+
+def _numeric_profile(values, quantiles):
+    # one sort gives the cardinality, min, max and the quantiles (linear interpolation as in describe)
+    values = values.to_numpy(dtype='float64', na_value=np.nan)
+    present = np.sort(values[~np.isnan(values)])
+    row = {'count': len(present), 'n_missing': len(values) - len(present),
+           'n_unique': int(np.count_nonzero(np.diff(present))) + 1 if len(present) else 0}
+    if len(present):
+        positions = np.asarray(quantiles) * (len(present) - 1)
+        lower = np.floor(positions).astype('int64')
+        upper = np.minimum(lower + 1, len(present) - 1)
+        row.update({'mean': present.mean(), 'std': present.std(ddof=1) if len(present) > 1 else np.nan,
+                    'min': present[0], 'max': present[-1]})
+        row.update(zip(_labels(quantiles), present[lower] + (present[upper] - present[lower]) * (positions - lower)))
+    return row
+
+
+def _factorized_profile(values):
+    # one factorize gives the null count, the cardinality and the most frequent value
+    codes, uniques = pd.factorize(values)
+    present = codes[codes >= 0]
+    row = {'count': len(present), 'n_missing': len(codes) - len(present), 'n_unique': len(uniques)}
+    if len(present):
+        counts = np.bincount(present)
+        row.update({'top': uniques[counts.argmax()], 'freq': counts.max()})
+    return row
+
+
+def _is_high_cardinality(values, n_probe=N_PROBE, min_unique=SKETCH_MIN_UNIQUE):
+    # the sketch is cheaper than a factorize from about min_unique distinct values. the cardinality is
+    # estimated from the pairs of equal values in a random probe of the rows: n_probe ** 2 / (2 * pairs)
+    if values.notna().sum() < min_unique:
+        return False
+    positions = np.random.default_rng(0).integers(0, len(values), n_probe)
+    counts = values.iloc[positions].value_counts().to_numpy(dtype='float64')
+    pairs = np.sum(counts * (counts - 1) / 2)
+    return pairs == 0 or n_probe ** 2 / (2 * pairs) >= min_unique
+
+
+def _sketched_profile(values, error):
+    # null count from notna, the cardinality from a HyperLogLog sketch, and the moments of numeric columns
+    present = values.notna().to_numpy()
+    count = int(np.count_nonzero(present))
+    row = {'count': count, 'n_missing': len(values) - count,
+           'n_unique': round(HyperLogLog(error).add(values, present).estimate())}
+    if row['count']:
+        row.update({'min': values.min(), 'max': values.max()})
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            row.update({'mean': values.mean(), 'std': values.std()})
+    return row
+
+
+def profile(dataframe, quantiles=QUANTILES, sample=None, random_state=42, cardinality='exact', error=0.01):
+    """
+    one row per column with dtype, count, n_missing, n_unique, mean, std, min, quantiles and max
+    (numeric columns) or top and freq (other columns), each column read once.
+    sample: number of rows (or fraction) to profile instead of the whole frame, for very tall
+    or wide frames. the counts are scaled to the frame, n_unique and the quantiles are estimates.
+    cardinality='hll': n_unique of the datetime columns with an estimated SKETCH_MIN_UNIQUE or more distinct
+    values is a HyperLogLog estimate with the relative standard error error (attrs['cardinality_error'],
+    attrs['sketched_columns']); the other columns are counted exactly, so the mode is not slower than 'exact'.
+    """
+    if cardinality not in ('exact', 'hll'):
+        raise ValueError(f"cardinality must be 'exact' or 'hll', got {cardinality!r}")
+    n_rows = len(dataframe)
+    if sample is not None:
+        n_sample = int(sample * n_rows) if isinstance(sample, float) else min(sample, n_rows)
+        dataframe = dataframe.sample(n_sample, random_state=random_state)
+
+    rows = {}
+    sketched = []
+    for col in dataframe.columns:
+        values = dataframe[col]
+        dtype = values.dtype
+        if cardinality == 'hll' and pd.api.types.is_datetime64_any_dtype(dtype) and _is_high_cardinality(values):
+            row = _sketched_profile(values, error)
+            sketched.append(col)
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            row = _numeric_profile(values, quantiles)
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            row = _factorized_profile(values)
+            row.update({'min': values.min(), 'max': values.max()})
+        else:
+            row = _factorized_profile(values)
+        rows[col] = {'dtype': dtype, **row}
+
+    result = pd.DataFrame.from_dict(rows, orient='index')
+    for col in [stat for stat in ['count', 'n_missing', 'n_unique', 'freq'] if stat in result]:
+        result[col] = result[col].astype('Int64' if col == 'freq' else 'int64')
+    if sample is not None and len(dataframe):
+        scale = n_rows / len(dataframe)
+        result['count'] = (result['count'] * scale).round().astype('int64')
+        result['n_missing'] = (result['n_missing'] * scale).round().astype('int64')
+    result.attrs.update({'n_rows': n_rows, 'sampled_rows': len(dataframe) if sample is not None else None,
+                         'cardinality_error': HyperLogLog(error).error if cardinality == 'hll' else None,
+                         'sketched_columns': sketched})
+    return result
+
+
+def check_df(dataframe, head=5, quantiles=QUANTILES, sample=None):
+    """head, tail, shape, dtypes, null counts and descriptive statistics from a single profile"""
+    stats = profile(dataframe, quantiles, sample=sample)
+    print('##################### Shape #####################')
+    print(dataframe.shape)
+    print('##################### Types #####################')
+    print(stats['dtype'])
+    print('##################### Head #####################')
+    print(dataframe.head(head))
+    print('##################### Tail #####################')
+    print(dataframe.tail(head))
+    print('##################### NA #####################')
+    print(stats['n_missing'])
+    print('##################### Quantiles #####################')
+    numeric = [col for col in ['count', 'mean', 'std', 'min', *_labels(quantiles), 'max'] if col in stats]
+    print(stats.loc[stats['mean'].notna() if 'mean' in stats else [], numeric])
+    return stats
+
+
+def grab_col_names(dataframe, cat_th=10, car_th=20, stats=None, sample=None, cardinality='exact', error=0.01,
+                   verbose=True):
+    """
+    cat_cols, num_cols, cat_but_car = grab_col_names(df)
+
+    the column types of grab_col_names in the scripts, with nunique read from the profile:
+    cat_cols: object columns and other columns with less than cat_th unique values
+    cat_but_car: object columns with more than car_th unique values
+    num_cols: columns that are not bool, category or object, without the numeric-but-categorical ones
+    a profile of the frame can be passed as stats to reuse it.
+    cardinality='hll' estimates nunique only of the datetime columns with about SKETCH_MIN_UNIQUE or more
+    distinct values, with a HyperLogLog sketch (see profile). their estimates are far above cat_th and
+    car_th, so the column types are those of the exact mode unless a threshold is near the cardinality.
+    """
+    if stats is None:
+        stats = profile(dataframe, quantiles=[], sample=sample, cardinality=cardinality, error=error)
+    dtypes = stats['dtype']
+    n_unique = stats['n_unique']
+    is_object = dtypes.map(_is_object)
+
+    cat_cols = [col for col in dataframe.columns if is_object[col]]
+    num_but_cat = [col for col in dataframe.columns if n_unique[col] < cat_th and not is_object[col]]
+    cat_but_car = [col for col in dataframe.columns if n_unique[col] > car_th and is_object[col]]
+    cat_cols = [col for col in cat_cols + num_but_cat if col not in cat_but_car]
+
+    num_cols = [col for col in dataframe.columns
+                if not (is_object[col] or pd.api.types.is_bool_dtype(dtypes[col])
+                        or isinstance(dtypes[col], pd.CategoricalDtype))]
+    num_cols = [col for col in num_cols if col not in num_but_cat]
+
+    if verbose:
+        print(f'Observations: {dataframe.shape[0]}')
+        print(f'Variables: {dataframe.shape[1]}')
+        print(f'cat_cols: {len(cat_cols)}')
+        print(f'num_cols: {len(num_cols)}')
+        print(f'cat_but_car: {len(cat_but_car)}')
+        print(f'num_but_cat: {len(num_but_cat)}')
+    return cat_cols, num_cols, cat_but_car
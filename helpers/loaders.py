@@ -0,0 +1,151 @@
+##########################################################################
+# Cached loading of online_retail_II
+##########################################################################
+# pd.read_excel takes minutes per sheet. each sheet is converted once into
+# a typed parquet file with lower-cased column names; later loads read the
+# cache and only the requested columns.
+#
+# df_ = load_online_retail(sheet_name='Year 2010-2011')
+# df_ = load_online_retail(sheet_name='Year 2010-2011', columns=['invoice', 'invoicedate', 'customer id'])
+#
+# with optimize=True the frame goes through optimize_dtypes: repeated
+# strings become categoricals, integers are downcast and customer id is a
+# nullable integer, which also makes the df_.copy() of the scripts cheap.
+# df_ = load_online_retail(sheet_name='Year 2010-2011', optimize=True)
+
+import hashlib
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+ONLINE_RETAIL_PATH = 'datasets/online_retail_II.xlsx'
+ONLINE_RETAIL_SHEETS = ['Year 2009-2010', 'Year 2010-2011']
+CACHE_DIR = 'datasets/cache'
+
+# string columns of online_retail_II. invoice and stockcode mix integers and strings in the xlsx
+STRING_COLUMNS = ['invoice', 'stockcode', 'description', 'country']
+DATE_COLUMNS = ['invoicedate']
+
+
+def source_key(path, method='mtime'):
+    """key of the source file: its size and mtime, or the sha1 of its content with method='hash'"""
+    if method == 'mtime':
+        stat = os.stat(path)
+        return f'{stat.st_size}_{stat.st_mtime_ns}'
+    if method == 'hash':
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                sha1.update(block)
+        return sha1.hexdigest()[:16]
+    raise ValueError(f"method must be 'mtime' or 'hash', got {method!r}")
+
+
+def lower_col_names(dataframe):
+    dataframe.columns = [col.lower() for col in dataframe.columns]
+    return dataframe
+
+
+def cast_online_retail(dataframe):
+    """types of the columns in the cache: strings, datetime64 invoicedate, float customer id"""
+    for col in STRING_COLUMNS:
+        if col in dataframe.columns:
+            dataframe[col] = dataframe[col].astype('string')
+    if 'invoicedate' in dataframe.columns:
+        dataframe['invoicedate'] = pd.to_datetime(dataframe['invoicedate'])
+    return dataframe
+
+
+def _smallest_integer(values, nullable):
+    # smallest (nullable) integer dtype that holds the values
+    low, high = values.min(), values.max()
+    for bits in [8, 16, 32, 64]:
+        info = np.iinfo(f'int{bits}')
+        if info.min <= low and high <= info.max:
+            return f'Int{bits}' if nullable else f'int{bits}'
+
+
+def optimize_dtypes(dataframe, max_category_ratio=0.5, date_columns=DATE_COLUMNS):
+    """
+    df, report = optimize_dtypes(df)
+
+    smaller dtypes with the same values:
+    - string columns with at most max_category_ratio unique values per row become categoricals
+    - date columns are parsed once to datetime64
+    - integer columns are downcast, float columns with whole numbers only (customer id) become
+      nullable integers; other floats stay float64, so sums like total_price do not change
+    returns the frame and a report of the dtypes and the memory of every column before and after.
+    """
+    before = dataframe.memory_usage(deep=True, index=False)
+    dtypes_before = dataframe.dtypes
+    dataframe = dataframe.copy()
+
+    for col in dataframe.columns:
+        values = dataframe[col]
+        if col in date_columns and not pd.api.types.is_datetime64_any_dtype(values.dtype):
+            dataframe[col] = pd.to_datetime(values)
+        elif values.dtype == 'O' or isinstance(values.dtype, pd.StringDtype):
+            if values.nunique() <= max_category_ratio * len(values):
+                dataframe[col] = values.astype('category')
+        elif pd.api.types.is_integer_dtype(values.dtype) and len(values):
+            dataframe[col] = values.astype(_smallest_integer(values, isinstance(values.dtype, pd.api.extensions.ExtensionDtype)))
+        elif pd.api.types.is_float_dtype(values.dtype):
+            present = values.dropna()
+            if len(present) and (present == np.round(present)).all() and np.isfinite(present).all():
+                dataframe[col] = values.astype(_smallest_integer(present, nullable=True))
+
+    after = dataframe.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'dtype_before': dtypes_before.astype(str), 'dtype_after': dataframe.dtypes.astype(str),
+                           'mb_before': before / 2 ** 20, 'mb_after': after / 2 ** 20})
+    report.loc['total'] = ['', '', before.sum() / 2 ** 20, after.sum() / 2 ** 20]
+    return dataframe, report
+
+
+def _cache_prefix(path, sheet_name, cache_dir):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    sheet = sheet_name.lower().replace(' ', '_')
+    return os.path.join(cache_dir, f'{stem}_{sheet}_')
+
+
+def build_cache(path=ONLINE_RETAIL_PATH, sheet_name=ONLINE_RETAIL_SHEETS[0], cache_dir=CACHE_DIR, key_method='mtime'):
+    """converts a sheet into the parquet cache (if it is not up to date) and returns the cache path"""
+    prefix = _cache_prefix(path, sheet_name, cache_dir)
+    cache_path = f'{prefix}{source_key(path, key_method)}.parquet'
+    if os.path.exists(cache_path):
+        return cache_path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    dataframe = pd.read_excel(path, sheet_name=sheet_name)
+    dataframe = cast_online_retail(lower_col_names(dataframe))
+
+    # written to a temporary file first, an interrupted write never leaves a truncated cache at cache_path
+    file_descriptor, temporary_path = tempfile.mkstemp(suffix='.tmp', dir=cache_dir)
+    os.close(file_descriptor)
+    try:
+        dataframe.to_parquet(temporary_path, index=False)
+        os.replace(temporary_path, cache_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+    # caches of older versions of the source are removed once the new one is in place
+    for file_name in os.listdir(cache_dir):
+        old_path = os.path.join(cache_dir, file_name)
+        if old_path.startswith(prefix) and old_path != cache_path:
+            os.remove(old_path)
+    return cache_path
+
+
+def load_online_retail(sheet_name=ONLINE_RETAIL_SHEETS[0], columns=None, path=ONLINE_RETAIL_PATH,
+                       cache_dir=CACHE_DIR, key_method='mtime', optimize=False):
+    """
+    same data as pd.read_excel(path, sheet_name=sheet_name) with lower-cased column names.
+    the first call builds the parquet cache, later calls only read the requested columns from it.
+    optimize=True applies optimize_dtypes to the loaded frame.
+    """
+    cache_path = build_cache(path, sheet_name, cache_dir, key_method)
+    dataframe = pd.read_parquet(cache_path, columns=columns)
+    if optimize:
+        dataframe, _ = optimize_dtypes(dataframe)
+    return dataframe
@@ -0,0 +1,150 @@
+##########################################################################
+# Model registry for BetaGeoFitter / GammaGammaFitter
+##########################################################################
+# every run of the cltv scripts refits the models from the default initial
+# params, although the optimum is nearly the same as yesterday. the registry
+# keeps the fitted params with a fingerprint of the rows of the data and
+# of the settings:
+#   - same fingerprint: the params are reused and the refit is skipped
+#   - new fingerprint: the previous params are the starting point of the optimizer
+#
+# bgf, bgf_metrics = fit_bgf(cltv_df['frequency'], cltv_df['recency'], cltv_df['T'], registry_dir='models')
+# ggf, ggf_metrics = fit_ggf(cltv_df['frequency'], cltv_df['monetary'], registry_dir='models')
+
+import datetime as dt
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from lifetimes import BetaGeoFitter, GammaGammaFitter
+import lifetimes.fitters as lifetimes_fitters
+from scipy.optimize import minimize
+from helpers.cltv import compress_lifetime_data
+
+
+def data_fingerprint(*columns, **settings):
+    """
+    fingerprint of the rows of the columns (the values and how they are paired) and of the settings.
+    the same values of a column paired with other rows of another column give another fingerprint.
+    """
+    rows = pd.DataFrame({i: np.asarray(col, dtype='float64') for i, col in enumerate(columns)})
+    digest = hashlib.sha1(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(sorted(settings.items())).encode())
+    return digest.hexdigest()[:16]
+
+
+def load_entry(registry_dir, name):
+    path = os.path.join(registry_dir, f'{name}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_entry(registry_dir, name, entry):
+    os.makedirs(registry_dir, exist_ok=True)
+    with open(os.path.join(registry_dir, f'{name}.json'), 'w') as file:
+        json.dump(entry, file, indent=4)
+
+
+def _fit_with_result(fitter, *args, **kwargs):
+    # fits and returns the OptimizeResult of scipy minimize, which lifetimes does not keep.
+    # nit and nfev are those of the optimizer, without the hessian lifetimes computes afterwards
+    results = []
+
+    def captured(*minimize_args, **minimize_kwargs):
+        result = minimize(*minimize_args, **minimize_kwargs)
+        results.append(result)
+        return result
+
+    lifetimes_fitters.minimize = captured
+    try:
+        fitter.fit(*args, **kwargs)
+    finally:
+        lifetimes_fitters.minimize = minimize
+    return results[-1]
+
+
+def _fit(fitter, name, params_index, fit_args, fingerprint, registry_dir, refit, to_initial_params, weights=None):
+    entry = None if registry_dir is None else load_entry(registry_dir, name)
+    metrics = {'model': name, 'fingerprint': fingerprint, 'reused': False, 'warm_start': False,
+               'n_rows': len(fit_args[0]), 'fit_seconds': 0.0, 'n_iterations': 0, 'n_evaluations': 0}
+
+    # same data as the registered fit: the params are reused
+    if entry is not None and entry['fingerprint'] == fingerprint and not refit:
+        fitter.params_ = pd.Series(entry['params'])[params_index]
+        metrics['reused'] = True
+        return fitter, metrics
+
+    # otherwise the registered params are the starting point of the optimizer
+    initial_params = None
+    if entry is not None:
+        initial_params = to_initial_params(pd.Series(entry['params'])[params_index])
+        metrics['warm_start'] = True
+
+    start = time.perf_counter()
+    result = _fit_with_result(fitter, *fit_args, weights=weights, initial_params=initial_params)
+    metrics['fit_seconds'] = time.perf_counter() - start
+    metrics['n_iterations'] = int(result.nit)
+    metrics['n_evaluations'] = int(result.nfev)
+
+    if registry_dir is not None:
+        save_entry(registry_dir, name, {'fingerprint': fingerprint,
+                                        'params': fitter.params_.to_dict(),
+                                        'fitted_at': dt.datetime.now().isoformat(timespec='seconds'),
+                                        'metrics': metrics})
+    return fitter, metrics
+
+
+def fit_bgf(frequency, recency, T, penalizer_coef=0.001, registry_dir=None, name='bgf', refit=False, compress=False):
+    """
+    BetaGeoFitter(penalizer_coef).fit(frequency, recency, T) through the registry.
+    returns the fitter and the metrics (reused, warm_start, fit_seconds, and n_iterations and n_evaluations
+    of the objective in the optimizer, without the hessian that lifetimes computes after it).
+    a reused fitter only has params_ and predict, it can not be plotted with plot_period_transactions.
+    with compress=True the model is fitted on the unique (frequency, recency, T) rows with weights.
+    """
+    bgf = BetaGeoFitter(penalizer_coef=penalizer_coef)
+    fingerprint = data_fingerprint(frequency, recency, T, model='bgf', penalizer_coef=penalizer_coef,
+                                   compress=compress)
+    weights = None
+    if compress:
+        compact, _ = compress_lifetime_data(pd.DataFrame({'frequency': np.asarray(frequency),
+                                                          'recency': np.asarray(recency),
+                                                          'T': np.asarray(T)}))
+        frequency, recency, T, weights = [compact[col] for col in ['frequency', 'recency', 'T', 'weights']]
+
+    # lifetimes optimizes the log of the params, with alpha scaled by 1 / max(T)
+    def to_initial_params(params):
+        params = params.copy()
+        params['alpha'] *= 1.0 / np.max(T)
+        return np.log(params.to_numpy())
+
+    bgf, metrics = _fit(bgf, name, ['r', 'alpha', 'a', 'b'], (frequency, recency, T),
+                        fingerprint, registry_dir, refit, to_initial_params, weights)
+    bgf.predict = bgf.conditional_expected_number_of_purchases_up_to_time
+    return bgf, metrics
+
+
+def fit_ggf(frequency, monetary, penalizer_coef=0.01, registry_dir=None, name='ggf', refit=False, compress=False):
+    """
+    GammaGammaFitter(penalizer_coef).fit(frequency, monetary) through the registry, see fit_bgf.
+    with compress=True the model is fitted on the unique (frequency, monetary) rows with weights.
+    """
+    ggf = GammaGammaFitter(penalizer_coef=penalizer_coef)
+    fingerprint = data_fingerprint(frequency, monetary, model='ggf', penalizer_coef=penalizer_coef,
+                                   compress=compress)
+    weights = None
+    if compress:
+        compact, _ = compress_lifetime_data(pd.DataFrame({'frequency': np.asarray(frequency),
+                                                          'monetary': np.asarray(monetary)}),
+                                            columns=['frequency', 'monetary'])
+        frequency, monetary, weights = [compact[col] for col in ['frequency', 'monetary', 'weights']]
+
+    def to_initial_params(params):
+        return np.log(params.to_numpy())
+
+    return _fit(ggf, name, ['p', 'q', 'v'], (frequency, monetary),
+                fingerprint, registry_dir, refit, to_initial_params, weights)
@@ -0,0 +1,120 @@
+##########################################################################
+# Outlier suppression over many columns
+##########################################################################
+# the cltv scripts call replace_with_thresholds(df, col) once per column,
+# and every call computes quantile(q1) and quantile(q3) separately before
+# two masked .loc assignments. winsorize computes the quantiles of all the
+# columns with one quantile([q1, q3]) call, clips every column with
+# np.clip and returns the thresholds it used.
+#
+# flo: the limits are rounded with round() before the comparison
+# thresholds = winsorize(df, [col for col in df.columns if 'ever' in col], rounding='limits')
+#
+# online retail: values beyond the limits are replaced with round(limit, 0)
+# thresholds = winsorize(df, ['quantity', 'price'], q1=0.01, q3=0.99, rounding='replacement')
+#
+# the returned thresholds can be passed back as limits= to suppress new
+# data with the same limits. for chunked data the limits can come from
+# merged quantile sketches:
+# winsorize(chunk, columns, limits=sketch_thresholds(digests), rounding='limits')
+
+import numpy as np
+import pandas as pd
+
+ROUNDINGS = (None, 'limits', 'replacement')
+
+
+def outlier_thresholds(dataframe, columns, q1=0.05, q3=0.95, iqr_factor=1.5):
+    """
+    quantiles and limits of outlier_thresholds in the scripts for every column, from one quantile call:
+    low_limit = q1 - iqr_factor * (q3 - q1), up_limit = q3 + iqr_factor * (q3 - q1)
+    """
+    columns = list(columns)
+    quantiles = dataframe[columns].quantile([q1, q3])
+    return _thresholds(quantiles.iloc[0], quantiles.iloc[1], columns, q1, q3, iqr_factor)
+
+
+def sketch_thresholds(digests, q1=0.05, q3=0.95, iqr_factor=1.5):
+    """
+    outlier_thresholds from quantile sketches, {column: TDigest} built per chunk or partition and
+    merged, without the whole columns. the limits are approximate (see TDigest for the error), so the
+    rounded limits of winsorize(rounding='limits') can differ from those of outlier_thresholds, mostly
+    in columns of continuous values such as the customer values of the flo data.
+    """
+    columns = list(digests)
+    quantiles = np.array([digests[col].quantile([q1, q3]) for col in columns]).reshape(-1, 2)
+    return _thresholds(quantiles[:, 0], quantiles[:, 1], columns, q1, q3, iqr_factor)
+
+
+def _thresholds(quantile1, quantile3, columns, q1, q3, iqr_factor):
+    thresholds = pd.DataFrame({'q1': quantile1, 'q3': quantile3}, index=columns)
+    interquantile_range = thresholds['q3'] - thresholds['q1']
+    thresholds['low_limit'] = thresholds['q1'] - iqr_factor * interquantile_range
+    thresholds['up_limit'] = thresholds['q3'] + iqr_factor * interquantile_range
+    thresholds.attrs.update({'q1': q1, 'q3': q3, 'iqr_factor': iqr_factor})
+    return thresholds
+
+
+def _limits_frame(limits, columns):
+    # a thresholds frame or {column: (low_limit, up_limit)}
+    if isinstance(limits, pd.DataFrame):
+        return limits.loc[columns, ['low_limit', 'up_limit']]
+    return pd.DataFrame([limits[col] for col in columns], index=columns, columns=['low_limit', 'up_limit'])
+
+
+def _restore_dtype(values, clipped, dtype):
+    # integer columns stay integer when the replaced values are whole numbers, as with .loc
+    if pd.api.types.is_integer_dtype(dtype):
+        present = clipped[~np.isnan(clipped)]
+        if np.array_equal(present, np.round(present)):
+            return pd.Series(clipped, index=values.index).astype(dtype)
+    return clipped
+
+
+def winsorize(dataframe, columns, q1=0.05, q3=0.95, rounding=None, limits=None, iqr_factor=1.5):
+    """
+    thresholds = winsorize(df, ['order_num_total_ever_online', 'order_num_total_ever_offline'], rounding='limits')
+
+    replace_with_thresholds of the scripts for all columns at once, in place. the limits come from
+    outlier_thresholds (one quantile call for all the columns) or from limits, a thresholds frame of an
+    earlier call or a dict {column: (low_limit, up_limit)}.
+    rounding:
+    - None: values are clipped to the limits
+    - 'limits': the limits are rounded with round() and the values clipped to them (flo script, whole frequencies)
+    - 'replacement': values beyond the limits are replaced with round(limit, 0) (online retail scripts)
+    returns the thresholds with the replacement values (low_value, up_value) and the number of
+    replaced values per column (n_low, n_up).
+    """
+    if rounding not in ROUNDINGS:
+        raise ValueError(f'rounding must be one of {ROUNDINGS}, got {rounding!r}')
+    columns = list(columns)
+    if limits is None:
+        thresholds = outlier_thresholds(dataframe, columns, q1, q3, iqr_factor)
+    else:
+        thresholds = _limits_frame(limits, columns).astype('float64')
+    if rounding == 'limits':
+        thresholds['low_limit'] = thresholds['low_limit'].round()
+        thresholds['up_limit'] = thresholds['up_limit'].round()
+    thresholds['low_value'] = thresholds['low_limit'].round() if rounding else thresholds['low_limit']
+    thresholds['up_value'] = thresholds['up_limit'].round() if rounding else thresholds['up_limit']
+
+    n_low, n_up = [], []
+    for col, (low_limit, up_limit, low_value, up_value) in zip(
+            columns, thresholds[['low_limit', 'up_limit', 'low_value', 'up_value']].to_numpy()):
+        values = dataframe[col]
+        clipped = values.to_numpy(dtype='float64', na_value=np.nan, copy=True)
+        low, up = clipped < low_limit, clipped > up_limit
+        n_low.append(int(np.count_nonzero(low)))
+        n_up.append(int(np.count_nonzero(up)))
+        if rounding == 'replacement':
+            # compared with the exact limits, replaced with the rounded ones
+            clipped[low] = low_value
+            clipped[up] = up_value
+        else:
+            np.clip(clipped, low_limit, up_limit, out=clipped)
+        dataframe[col] = _restore_dtype(values, clipped, values.dtype)
+
+    thresholds['n_low'] = n_low
+    thresholds['n_up'] = n_up
+    thresholds.attrs['rounding'] = rounding
+    return thresholds
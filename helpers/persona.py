@@ -0,0 +1,143 @@
+##########################################################################
+# Persona lookup for the rule-based classification
+##########################################################################
+# 03_hafta_kural_tabanli_siniflandirma_mg.py finds the segment of a new
+# user with age_df[age_df['CUSTOMERS_LEVEL_BASED'] == new_user], a scan of
+# the whole table per user. PersonaLookup compiles age_df once into a dict
+# for single keys and into a table indexed by the category codes of
+# (country, source, sex, age bin) for batches of users.
+#
+# lookup = PersonaLookup(age_df)
+# lookup['tur_android_female_31_40']                 # (PRICE, SEGMENT)
+# lookup.lookup_users(new_users['COUNTRY'], new_users['SOURCE'], new_users['SEX'], new_users['AGE'])
+#
+# level_based_keys encodes the same four parts as one int64 key per row, so
+# that CUSTOMERS_LEVEL_BASED is grouped on integers; the key strings are
+# only rendered for the output with render_keys.
+
+import numpy as np
+import pandas as pd
+
+# age bins of pd.cut in the script: (0, 18], (18, 23], (23, 30], (30, 40], (40, 70]
+AGE_BINS = [0, 18, 23, 30, 40, 70]
+AGE_LABELS = ['0_18', '19_23', '24_30', '31_40', '41_70']
+
+
+def age_codes(age, bins=AGE_BINS):
+    """position of the pd.cut(age, bins) label of every age, -1 outside the bins and for missing ages"""
+    age = np.asarray(age, dtype='float64')
+    codes = np.searchsorted(np.asarray(bins, dtype='float64'), age, side='left') - 1
+    return np.where((codes < 0) | (codes >= len(bins) - 1), -1, codes)
+
+
+def category_codes(values, categories):
+    """position of every value in categories, -1 for unknown and missing values"""
+    # the few distinct values are looked up once instead of hashing every string against the categories
+    if not hasattr(values, 'dtype'):
+        values = np.asarray(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    categories = categories if isinstance(categories, pd.Index) else pd.Index(categories)
+    return np.append(categories.get_indexer(uniques), -1)[codes]
+
+
+def combine_codes(codes, shape):
+    """one int64 key per row from the category codes of every part, -1 if a part is missing"""
+    found = np.all([code >= 0 for code in codes], axis=0)
+    keys = np.ravel_multi_index(tuple(np.where(found, code, 0) for code in codes), shape)
+    return np.where(found, keys, -1)
+
+
+def level_based_keys(dataframe, columns=('COUNTRY', 'SOURCE', 'SEX'), age='AGE', categories=None,
+                     age_bins=AGE_BINS, age_labels=AGE_LABELS):
+    """
+    keys, categories = level_based_keys(age_df)
+    age_df.groupby(keys).agg({'PRICE': 'mean'})
+
+    int64 key of the level based customer (country_source_sex_agebin) of every row, without building
+    strings: the parts are category codes (sorted, or positions in the given categories) and the age
+    is binned like pd.cut(age, age_bins). rows with a missing or unknown part get -1.
+    dataframe can also be a dict of columns.
+    returns the keys and the categories of the parts, for render_keys.
+    """
+    if categories is None:
+        categories = [pd.Index(np.sort(pd.unique(dataframe[col].dropna()))) for col in columns]
+        categories.append(pd.Index(age_labels))
+    codes = [category_codes(dataframe[col], category) for col, category in zip(columns, categories)]
+    codes.append(age_codes(dataframe[age], age_bins))
+    return combine_codes(codes, tuple(len(category) for category in categories)), categories
+
+
+def render_keys(keys, categories, sep='_'):
+    """key strings (e.g. 'tur_android_female_31_40') of int64 level based keys, None for -1"""
+    keys = np.asarray(keys, dtype='int64')
+    found = keys >= 0
+    codes = np.unravel_index(np.where(found, keys, 0), tuple(len(category) for category in categories))
+    parts = [np.asarray(category, dtype=object)[code] for category, code in zip(categories, codes)]
+    return [sep.join(part) if ok else None for part, ok in zip(zip(*parts), found)]
+
+
+class PersonaLookup:
+    """
+    (PRICE, SEGMENT) of level based customers (country_source_sex_agebin) from the age_df of the script.
+    single keys are looked up in a dict, batches of (country, source, sex, age) users through a dense
+    table of row positions indexed by the category codes of the four parts, both O(1) per user.
+    """
+
+    def __init__(self, age_df, key='CUSTOMERS_LEVEL_BASED', columns=('PRICE', 'SEGMENT'),
+                 age_bins=AGE_BINS, age_labels=AGE_LABELS):
+        self.columns = list(columns)
+        self.age_bins = age_bins
+        keys = age_df[key].astype(str).to_numpy()
+        self._positions = dict(zip(keys, range(len(keys))))
+        self._rows = dict(zip(keys, zip(*[age_df[col].to_list() for col in self.columns])))
+
+        # one extra row of missing values for the users that are not found
+        self._values = {col: _append_missing(age_df[col]) for col in self.columns}
+        self._missing = len(keys)
+
+        # country, source and sex are the first three parts of the key, the age label is the rest
+        parts = pd.Series(keys).str.split('_', n=3, expand=True)
+        self.categories = [pd.Index(parts[i].unique()) for i in range(3)] + [pd.Index(age_labels)]
+        codes = [category.get_indexer(parts[i]) for i, category in enumerate(self.categories)]
+        self._shape = tuple(len(category) for category in self.categories)
+        self._table = np.full(self._shape, self._missing, dtype='int64')
+        found = np.all([code >= 0 for code in codes], axis=0)
+        self._table[tuple(code[found] for code in codes)] = np.arange(len(keys))[found]
+
+    def __len__(self):
+        return self._missing
+
+    def __getitem__(self, key):
+        return self._rows[key]
+
+    def get(self, key, default=None):
+        return self._rows.get(key, default)
+
+    def lookup_keys(self, keys):
+        """PRICE and SEGMENT of a batch of level based keys, missing values for unknown keys"""
+        positions = np.fromiter((self._positions.get(key, self._missing) for key in keys), dtype='int64')
+        return self._frame(positions, keys.index if isinstance(keys, pd.Series) else None)
+
+    def lookup_users(self, country, source, sex, age):
+        """
+        PRICE and SEGMENT of a batch of users, with the age binned as pd.cut(age, age_bins).
+        the columns are mapped to category codes with hash lookups and the row of every user is read
+        from the dense table, no key string is built. unknown users get missing values.
+        """
+        users = {'COUNTRY': country, 'SOURCE': source, 'SEX': sex, 'AGE': age}
+        keys, _ = level_based_keys(users, categories=self.categories, age_bins=self.age_bins)
+        positions = np.where(keys >= 0, self._table.ravel()[np.maximum(keys, 0)], self._missing)
+        return self._frame(positions, country.index if isinstance(country, pd.Series) else None)
+
+    def _frame(self, positions, index):
+        return pd.DataFrame({col: self._values[col][positions] for col in self.columns}, index=index)
+
+
+def _append_missing(column):
+    # categorical columns keep their categories, with code -1 for the missing row
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(np.append(column.cat.codes.to_numpy(), -1), dtype=column.dtype)
+    values = column.to_numpy()
+    if values.dtype.kind in 'biuf':
+        return np.append(values.astype('float64'), np.nan)
+    return np.append(values.astype(object), None)
@@ -0,0 +1,213 @@
+##########################################################################
+# Online persona scoring service
+##########################################################################
+# the rule-based classification ends with checks like
+# new_user = 'tur_android_female_31_40'. this module serves the same
+# answer over http: the persona/segment table (CUSTOMERS_LEVEL_BASED,
+# PRICE, SEGMENT) is loaded once into a PersonaLookup at startup, and the
+# concurrent requests are collected into micro-batches that are scored
+# with one lookup_users call.
+#
+# python -m helpers.persona_service datasets/persona_segments.csv 8080
+#
+# curl -d '{"country": "tur", "source": "android", "sex": "female", "age": 33}' localhost:8080/score
+# {"PRICE": 35.1, "SEGMENT": "A"}
+#
+# a json list of users in one request is scored as a list.
+
+import asyncio
+import json
+import math
+import sys
+import pandas as pd
+from helpers.persona import PersonaLookup
+
+USER_FIELDS = ['country', 'source', 'sex', 'age']
+
+
+def load_segments(path):
+    """persona/segment table saved from the age_df of the script (csv or parquet)"""
+    if str(path).endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+class MicroBatcher:
+    """
+    collects the users of concurrent score() calls and scores them together: the first user of a batch
+    waits max_delay seconds for others, then up to max_batch users are scored with one lookup_users call.
+    """
+
+    def __init__(self, lookup, max_batch=1024, max_delay=0.001):
+        self.lookup = lookup
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.n_batches = 0
+        self.n_scored = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def score(self, user):
+        """(PRICE, SEGMENT) of a dict with the country, source, sex and age of a user, None if unknown"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((user, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            self.n_batches += 1
+            self.n_scored += len(batch)
+
+            try:
+                self._score_batch(batch)
+            except Exception:
+                # one bad user must not fail the others: the users are scored one at a time
+                for item in batch:
+                    try:
+                        self._score_batch([item])
+                    except Exception as error:
+                        if not item[1].done():
+                            item[1].set_exception(error)
+
+    def _score_batch(self, batch):
+        users = [user for user, _ in batch]
+        scores = self.lookup.lookup_users(*[[user.get(field) for user in users] for field in USER_FIELDS])
+        results = zip(scores['PRICE'].to_list(), scores['SEGMENT'].to_list())
+        for (_, future), (price, segment) in zip(batch, results):
+            if not future.done():
+                future.set_result(None if price is None or math.isnan(price) else (price, segment))
+
+
+async def _read_request(reader):
+    # minimal http/1.1: request line, headers and a content-length body. ValueError if malformed
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise ValueError(f'malformed request line {request_line[:100]!r}') from None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        content_length = int(headers.get('content-length', 0))
+    except ValueError:
+        content_length = -1
+    if content_length < 0:
+        raise ValueError(f"invalid content-length {headers['content-length'][:100]!r}")
+    body = await reader.readexactly(content_length)
+    return method, path, headers, body
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    head = (f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    return head.encode('latin-1') + body
+
+
+def _valid_user(user):
+    # country, source and sex are strings (or missing), age a number (or missing), not a bool
+    return (isinstance(user, dict)
+            and all(isinstance(user.get(field), (str, type(None))) for field in ['country', 'source', 'sex'])
+            and isinstance(user.get('age'), (int, float, type(None))) and not isinstance(user.get('age'), bool))
+
+
+def _score_payload(score):
+    return {'PRICE': None, 'SEGMENT': None} if score is None else {'PRICE': score[0], 'SEGMENT': score[1]}
+
+
+async def _handle(batcher, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except ValueError as error:
+                # the rest of the stream can not be parsed: answered, then the connection is closed
+                writer.write(_response('400 Bad Request', {'error': str(error)}, keep_alive=False))
+                await writer.drain()
+                break
+            if request is None:
+                break
+            method, path, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+
+            if method == 'POST' and path == '/score':
+                try:
+                    users = json.loads(body)
+                except ValueError:
+                    users = None
+                if not (_valid_user(users) or isinstance(users, list) and all(_valid_user(user) for user in users)):
+                    writer.write(_response('400 Bad Request', {'error': 'body must be a json user or a list of users '
+                                                                        'with string country, source and sex and a '
+                                                                        'numeric age'}, keep_alive))
+                else:
+                    try:
+                        if isinstance(users, list):
+                            scores = await asyncio.gather(*[batcher.score(user) for user in users])
+                            payload = [_score_payload(score) for score in scores]
+                        else:
+                            payload = _score_payload(await batcher.score(users))
+                    except Exception as error:
+                        writer.write(_response('500 Internal Server Error', {'error': repr(error)}, keep_alive))
+                    else:
+                        writer.write(_response('200 OK', payload, keep_alive))
+            elif method == 'GET' and path == '/health':
+                writer.write(_response('200 OK', {'personas': len(batcher.lookup),
+                                                  'batches': batcher.n_batches,
+                                                  'scored': batcher.n_scored}, keep_alive))
+            else:
+                writer.write(_response('404 Not Found', {'error': f'{method} {path}'}, keep_alive))
+
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(segments, host='127.0.0.1', port=8080, max_batch=1024, max_delay=0.001):
+    """
+    server, batcher = await start_server(age_df, port=8080)
+
+    starts the scoring service on the table (a dataframe or the path of a saved one) and returns
+    the asyncio server and the micro-batcher. POST /score takes a user or a list of users.
+    """
+    if not isinstance(segments, pd.DataFrame):
+        segments = load_segments(segments)
+    batcher = MicroBatcher(PersonaLookup(segments), max_batch=max_batch, max_delay=max_delay)
+    batcher.start()
+    server = await asyncio.start_server(lambda reader, writer: _handle(batcher, reader, writer), host, port)
+    return server, batcher
+
+
+async def serve(segments, host='127.0.0.1', port=8080, **kwargs):
+    server, _ = await start_server(segments, host, port, **kwargs)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    asyncio.run(serve(sys.argv[1], port=int(sys.argv[2]) if len(sys.argv) > 2 else 8080))
@@ -0,0 +1,147 @@
+##########################################################################
+# Rating products
+##########################################################################
+# batch versions of the rating functions of the 05_hafta scripts
+
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import scipy.stats as st
+
+# buckets and weights of time_based_weighted_average and user_based_weighted_average:
+# days <= 30, 30 < days <= 90, 90 < days <= 180, days > 180
+DAY_EDGES = (30, 90, 180)
+DAY_WEIGHTS = (0.28, 0.26, 0.24, 0.22)
+# progress <= 10, 10 < progress <= 45, 45 < progress <= 75, progress > 75
+PROGRESS_EDGES = (10, 45, 75)
+PROGRESS_WEIGHTS = (0.22, 0.24, 0.26, 0.28)
+
+
+@lru_cache(maxsize=None)
+def z_value(confidence=0.95):
+    """two-sided z value of the confidence level, computed once per level"""
+    return st.norm.ppf(1 - (1 - confidence) / 2)
+
+
+def bayesian_average_rating_batch(counts, confidence=0.95):
+    """
+    new_df['bar_score'] = bayesian_average_rating_batch(new_df[['one', 'two', ..., 'ten']])
+
+    bayesian_average_rating of every row of an (items x stars) matrix of star counts
+    """
+    counts = np.asarray(counts, dtype='float64')
+    K = counts.shape[1]
+    stars = np.arange(1, K + 1, dtype='float64')
+    N = counts.sum(axis=1)
+
+    share = (counts + 1) / (N + K)[:, None]
+    first_part = share @ stars
+    second_part = share @ (stars * stars)
+    score = first_part - z_value(confidence) * np.sqrt((second_part - first_part * first_part) / (N + K + 1))
+    return np.where(N == 0, 0.0, score)
+
+
+def bucket_codes(values, edges):
+    """
+    bucket of every value for the right-closed buckets (-inf, e1], (e1, e2], ..., (ek, inf),
+    missing values get the extra bucket len(edges) + 1
+    """
+    values = np.asarray(values)
+    edges = np.asarray(edges)
+    if len(edges) < 127:
+        # counting the edges below every value is faster than a binary search for a few edges
+        codes = np.zeros(len(values), dtype='int8')
+        for edge in edges:
+            codes += values > edge
+        codes = codes.astype('intp')
+    else:
+        codes = np.searchsorted(edges, values, side='left')
+    if values.dtype.kind == 'f':
+        codes[np.isnan(values)] = len(edges) + 1
+    return codes
+
+
+def _bucket_means(ratings, bucketings, groups=None, n_groups=1):
+    # mean ratings in the buckets of every (values, edges) bucketing, as one groups x buckets matrix per bucketing.
+    # every review gets one cell of the joint table of the buckets, the sums and counts of all cells come
+    # from one bincount each, and the means of a bucketing come from the margins of the table
+    ratings = np.asarray(ratings, dtype='float64')
+    shape = [len(edges) + 2 for _, edges in bucketings]
+    n_cells = n_groups * int(np.prod(shape))
+
+    cells = np.zeros(len(ratings), dtype='intp') if groups is None else np.array(groups, dtype='intp')
+    for (values, edges), size in zip(bucketings, shape):
+        cells *= size
+        cells += bucket_codes(values, edges)
+
+    # reviews without a rating go to an extra cell, as .mean() skips them
+    missing = np.isnan(ratings)
+    if missing.any():
+        cells[missing] = n_cells
+        ratings = np.where(missing, 0.0, ratings)
+    sums = np.bincount(cells, ratings, minlength=n_cells + 1)[:n_cells].reshape(n_groups, *shape)
+    counts = np.bincount(cells, minlength=n_cells + 1)[:n_cells].reshape(n_groups, *shape)
+
+    means = []
+    for axis in range(1, len(shape) + 1):
+        others = tuple(other for other in range(1, len(shape) + 1) if other != axis)
+        # the last bucket of every bucketing holds the missing values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means.append(sums.sum(axis=others)[:, :-1] / counts.sum(axis=others)[:, :-1])
+    return means
+
+
+def _weighted_averages(day_means, progress_means, day_weights, progress_weights, time_w, user_w):
+    day_weights = np.asarray(day_weights, dtype='float64')
+    progress_weights = np.asarray(progress_weights, dtype='float64')
+    if day_means.shape[1] != len(day_weights) or progress_means.shape[1] != len(progress_weights):
+        raise ValueError('every bucket needs a weight: len(weights) must be len(edges) + 1')
+    time_based = day_means @ day_weights
+    user_based = progress_means @ progress_weights
+    return time_based, user_based, time_based * time_w + user_based * user_w
+
+
+def bucketed_weighted_rating(dataframe, time_w=0.50, user_w=0.50,
+                             day_edges=DAY_EDGES, day_weights=DAY_WEIGHTS,
+                             progress_edges=PROGRESS_EDGES, progress_weights=PROGRESS_WEIGHTS,
+                             columns=('days', 'progress', 'rating')):
+    """
+    bucketed_weighted_rating(df)['weighted_rating'] == weighted_rating(df)
+
+    time_based_weighted_average, user_based_weighted_average and weighted_rating of a review frame
+    in one pass: every review gets its day bucket and progress bucket with searchsorted, and the
+    mean ratings of all buckets come from a single bincount. the edges and weights are configurable,
+    a bucket without reviews makes the average nan as in the scalar functions.
+    """
+    days, progress, rating = [dataframe[col] for col in columns]
+    day_means, progress_means = _bucket_means(rating, [(days, day_edges), (progress, progress_edges)])
+    time_based, user_based, weighted = _weighted_averages(day_means, progress_means, day_weights,
+                                                          progress_weights, time_w, user_w)
+    return pd.Series({'time_based_weighted_average': time_based[0],
+                      'user_based_weighted_average': user_based[0],
+                      'weighted_rating': weighted[0]})
+
+
+def grouped_weighted_rating(dataframe, product='course id', time_w=0.50, user_w=0.50,
+                            day_edges=DAY_EDGES, day_weights=DAY_WEIGHTS,
+                            progress_edges=PROGRESS_EDGES, progress_weights=PROGRESS_WEIGHTS,
+                            columns=('days', 'progress', 'rating')):
+    """
+    ratings = grouped_weighted_rating(reviews, product='course id')
+
+    bucketed_weighted_rating of every product of a long review table in one pass, instead of
+    calling weighted_rating per product: the product is one more axis of the bucket table, so the
+    memory is products x buckets and not reviews x products. returns a frame indexed by product.
+    """
+    codes, products = pd.factorize(dataframe[product], sort=True)
+    days, progress, rating = [dataframe[col] for col in columns]
+
+    # reviews without a product are left out with a missing rating
+    rating = np.where(codes < 0, np.nan, rating) if (codes < 0).any() else rating
+    day_means, progress_means = _bucket_means(rating, [(days, day_edges), (progress, progress_edges)],
+                                              groups=np.maximum(codes, 0), n_groups=len(products))
+    time_based, user_based, weighted = _weighted_averages(day_means, progress_means, day_weights,
+                                                          progress_weights, time_w, user_w)
+    return pd.DataFrame({'time_based_weighted_average': time_based,
+                         'user_based_weighted_average': user_based,
+                         'weighted_rating': weighted}, index=pd.Index(products, name=product))
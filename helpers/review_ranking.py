@@ -0,0 +1,180 @@
+##########################################################################
+# Review ranking
+##########################################################################
+# array versions of scores_pos_ned_diff, score_average_rating and
+# wilson_lower_bound of 05_hafta_sorting_reviews_application.py, computed
+# over the up/down count columns at once, and a top-k ordering that
+# only sorts the k best reviews.
+#
+# top = rank_reviews(df, k=20)
+#
+# for streaming votes, ReviewRankingIndex keeps the top-k reviews of every
+# product up to date with O(log n) work per vote.
+
+import heapq
+import math
+from itertools import count
+import numpy as np
+import pandas as pd
+from helpers.rating import z_value
+
+
+def scores_pos_ned_diff(up, down):
+    return np.asarray(up) - np.asarray(down)
+
+
+def score_average_rating(up, down):
+    """up / (up + down), 0 for reviews without votes"""
+    up = np.asarray(up, dtype='float64')
+    n = up + np.asarray(down, dtype='float64')
+    return np.divide(up, n, out=np.zeros_like(n), where=n > 0)
+
+
+def wilson_lower_bound(up, down, confidence=0.95):
+    """lower bound of the wilson score interval of up / (up + down), 0 for reviews without votes"""
+    up = np.asarray(up, dtype='float64')
+    n = up + np.asarray(down, dtype='float64')
+    z = z_value(confidence)
+
+    # n == 0 is computed with n = 1 and masked, instead of branching per review
+    n_safe = np.maximum(n, 1)
+    phat = up / n_safe
+    score = (phat + z * z / (2 * n_safe)
+             - z * np.sqrt((phat * (1 - phat) + z * z / (4 * n_safe)) / n_safe)) / (1 + z * z / n_safe)
+    return np.where(n > 0, score, 0.0)
+
+
+def top_k(scores, k):
+    """positions of the k highest scores in descending order, without sorting all the scores"""
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k == 0:
+        return np.array([], dtype='int64')
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def rank_reviews(dataframe, k=None, up='up', down='down', confidence=0.95):
+    """
+    adds scores_pos_ned_diff, score_average_rating and wilson_lower_bound to the reviews
+    and returns the k best reviews by wilson_lower_bound (all reviews if k is None)
+    """
+    dataframe = dataframe.copy()
+    dataframe['scores_pos_ned_diff'] = scores_pos_ned_diff(dataframe[up], dataframe[down])
+    dataframe['score_average_rating'] = score_average_rating(dataframe[up], dataframe[down])
+    dataframe['wilson_lower_bound'] = wilson_lower_bound(dataframe[up], dataframe[down], confidence)
+    order = top_k(dataframe['wilson_lower_bound'], len(dataframe) if k is None else k)
+    return dataframe.iloc[order]
+
+
+class ReviewRankingIndex:
+    """
+    index = ReviewRankingIndex(k=10)
+    index.vote('product_1', 'review_7', up=1)
+    index.top('product_1')   # [(review, wilson_lower_bound, up, down), ...]
+
+    top-k reviews by wilson lower bound per product under streaming votes. every product keeps
+    a bounded min-heap of its current top-k and a max-heap of the other reviews, both with lazy
+    deletion: a vote pushes the new score in O(log n) and at most one review moves between the
+    heaps. reads return the cached top-k and only sort the k reviews after the top-k changed.
+    """
+
+    def __init__(self, k=10, confidence=0.95):
+        self.k = k
+        self.z = z_value(confidence)
+        self._products = {}
+        self._sequence = count()
+
+    def _product(self, product):
+        state = self._products.get(product)
+        if state is None:
+            state = {'votes': {}, 'version': {}, 'in_top': set(), 'top': [], 'rest': [], 'ranked': []}
+            self._products[product] = state
+        return state
+
+    def wilson_lower_bound(self, up, down):
+        n = up + down
+        if n == 0:
+            return 0.0
+        z = self.z
+        phat = up / n
+        return (phat + z * z / (2 * n) - z * math.sqrt((phat * (1 - phat) + z * z / (4 * n)) / n)) / (1 + z * z / n)
+
+    def vote(self, product, review, up=0, down=0):
+        """adds up and down votes to a review and updates the top-k of its product"""
+        state = self._product(product)
+        votes = state['votes'].setdefault(review, [0, 0])
+        votes[0] += up
+        votes[1] += down
+        score = self.wilson_lower_bound(*votes)
+        version = next(self._sequence)
+        state['version'][review] = version
+
+        top_changed = review in state['in_top']
+        if top_changed:
+            heapq.heappush(state['top'], (score, version, review))
+        else:
+            heapq.heappush(state['rest'], (-score, version, review))
+            if len(state['in_top']) < self.k:
+                top_changed = self._move_best_of_rest_to_top(state)
+        top_changed = self._rebalance(state) or top_changed
+        self._compact(state)
+
+        # the cached ranking is kept while the top-k does not change
+        if top_changed:
+            state['ranked'] = None
+        return score
+
+    def top(self, product):
+        """the top-k reviews of the product as (review, wilson_lower_bound, up, down), best first"""
+        state = self._products.get(product)
+        if state is None:
+            return []
+        if state['ranked'] is None:
+            entries = [entry for entry in state['top'] if self._is_valid(state, entry, in_top=True)]
+            entries.sort(key=lambda entry: (-entry[0], entry[1]))
+            state['ranked'] = [(review, score, *state['votes'][review]) for score, _, review in entries]
+        return state['ranked']
+
+    @staticmethod
+    def _is_valid(state, entry, in_top):
+        _, version, review = entry
+        return state['version'][review] == version and (review in state['in_top']) == in_top
+
+    def _peek(self, state, heap_name):
+        # drops the stale entries on top of the heap
+        heap = state[heap_name]
+        while heap and not self._is_valid(state, heap[0], in_top=heap_name == 'top'):
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _move_best_of_rest_to_top(self, state):
+        best = self._peek(state, 'rest')
+        if best is None:
+            return False
+        heapq.heappop(state['rest'])
+        score, version, review = -best[0], best[1], best[2]
+        state['in_top'].add(review)
+        heapq.heappush(state['top'], (score, version, review))
+        return True
+
+    def _rebalance(self, state):
+        # only one score changed, so at most one swap restores min(top) >= max(rest)
+        worst = self._peek(state, 'top')
+        best = self._peek(state, 'rest')
+        if worst is None or best is None or -best[0] <= worst[0]:
+            return False
+        heapq.heappop(state['top'])
+        score, version, review = worst
+        state['in_top'].discard(review)
+        heapq.heappush(state['rest'], (-score, version, review))
+        return self._move_best_of_rest_to_top(state)
+
+    def _compact(self, state):
+        # rebuilds a heap when the stale entries outnumber the valid ones
+        for heap_name, in_top, size in [('top', True, len(state['in_top'])),
+                                         ('rest', False, len(state['votes']) - len(state['in_top']))]:
+            heap = state[heap_name]
+            if len(heap) > 2 * size + 32:
+                heap[:] = [entry for entry in heap if self._is_valid(state, entry, in_top)]
+                heapq.heapify(heap)
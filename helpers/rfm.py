@@ -0,0 +1,366 @@
+##########################################################################
+# RFM engine
+##########################################################################
+# the scripts in the 04_hafta family compute the rfm metrics with
+# groupby().agg({... lambda ...}), which calls python once per customer.
+# the functions below give the same output by using the built-in
+# aggregations (max, nunique, sum) or sort-based numpy reductions.
+#
+# for chunked or partitioned pipelines the qcut scores do not need the
+# whole columns: recency and monetary edges come from mergeable TDigest
+# sketches (qcut_edges, approximate), the ranked frequency score from the
+# mergeable frequency counts (ranked_frequency_scores, exact).
+
+from bisect import bisect_left, bisect_right
+import datetime as dt
+import json
+import numpy as np
+import pandas as pd
+
+# rfm nomenclatures
+SEG_MAP = {
+    r'[1-2][1-2]': 'hibernating',
+    r'[1-2][3-4]': 'at_risk',
+    r'[1-2]5': 'cant_loose_them',
+    r'3[1-2]': 'about_to_sleep',
+    r'33': 'need_attention',
+    r'[3-4][4-5]': 'loyal_customers',
+    r'41': 'promising',
+    r'51': 'new_customers',
+    r'[4-5][2-3]': 'potential_loyalists',
+    r'5[4-5]': 'champions'
+}
+
+
+def rfm_metrics(dataframe, today_date, customer='customer id', method='groupby'):
+    """
+    rfm = rfm_metrics(df, dt.datetime(2011, 12, 11))
+
+    returns recency, frequency and monetary per customer. 'total_price' must already exist.
+    method='groupby' uses the named built-in aggregations, method='numpy' uses sort-based reductions.
+    """
+    if method == 'groupby':
+        rfm = dataframe.groupby(customer).agg(
+            last_date=('invoicedate', 'max'),
+            frequency=('invoice', 'nunique'),
+            monetary=('total_price', 'sum'))
+        rfm.insert(0, 'recency', (today_date - rfm.pop('last_date')).dt.days)
+        return rfm
+    if method == 'numpy':
+        return _rfm_metrics_numpy(dataframe, today_date, customer)
+    raise ValueError(f"method must be 'groupby' or 'numpy', got {method!r}")
+
+
+def _rfm_metrics_numpy(dataframe, today_date, customer):
+    # integer codes of the customers in ascending order, as groupby does
+    codes, customers = pd.factorize(dataframe[customer], sort=True)
+    valid = codes >= 0
+    codes = codes[valid]
+    n_customers = len(customers)
+
+    # recency: the last invoice date of each customer after sorting by customer code
+    dates = dataframe['invoicedate'].to_numpy()[valid]
+    order = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[order], np.arange(n_customers))
+    last_date = np.maximum.reduceat(dates[order].view('int64'), starts).view(dates.dtype)
+    recency = (pd.Timestamp(today_date) - pd.DatetimeIndex(last_date)).days.to_numpy()
+
+    # frequency: distinct (customer, invoice) pairs counted per customer
+    invoice_codes, invoices = pd.factorize(dataframe['invoice'])
+    pairs = codes.astype('int64') * (len(invoices) + 1) + invoice_codes[valid]
+    frequency = np.bincount(np.unique(pairs) // (len(invoices) + 1), minlength=n_customers)
+
+    # monetary: weighted bincount of the total prices
+    monetary = np.bincount(codes, weights=dataframe['total_price'].to_numpy()[valid], minlength=n_customers)
+
+    return pd.DataFrame({'recency': recency.astype('int64'),
+                         'frequency': frequency.astype('int64'),
+                         'monetary': monetary},
+                        index=pd.Index(customers, name=customer))
+
+
+def prepare_invoices(dataframe):
+    """data preparation of create_rfm: total_price, missing values and returned invoices ('C')"""
+    dataframe['total_price'] = dataframe['quantity'] * dataframe['price']
+    dataframe.dropna(inplace=True)
+    return dataframe[~dataframe['invoice'].str.contains('C', na=False)]
+
+
+def read_invoice_chunks(path, chunksize=500_000, **kwargs):
+    """
+    for chunk in read_invoice_chunks('datasets/online_retail_II.csv'): ...
+
+    reads a csv export of the invoice lines chunk by chunk with lower-cased column names
+    """
+    for chunk in pd.read_csv(path, chunksize=chunksize, **kwargs):
+        chunk.columns = [col.lower() for col in chunk.columns]
+        chunk['invoice'] = chunk['invoice'].astype(str)
+        chunk['invoicedate'] = pd.to_datetime(chunk['invoicedate'])
+        yield chunk
+
+
+def rfm_metrics_streaming(chunks, today_date, customer='customer id', contiguous_invoices=False):
+    """
+    rfm = rfm_metrics_streaming(read_invoice_chunks(path), dt.datetime(2011, 12, 11))
+
+    same output as prepare_invoices + rfm_metrics, but the invoice lines are folded chunk by chunk
+    into per-customer partial aggregates (first/last invoice date, monetary sum, invoice count).
+    monetary can differ from rfm_metrics in the last floating point digits because of the order of the sums.
+
+    memory: the partial aggregates are O(customers), but the invoice count is not bounded by default:
+    - contiguous_invoices=False (default, right for lines in any order): the distinct (customer, invoice)
+      pairs of every chunk are kept until the end, so peak memory is O(customers + invoices)
+    - contiguous_invoices=True: only the last invoice of the previous chunk is kept, so memory is
+      O(customers + chunksize). the lines of an invoice must be contiguous in the source (as in
+      online_retail_II), otherwise an invoice split over non-adjacent chunks is counted twice.
+    """
+    partials = None
+    pairs = []
+    last_pair = None
+    for chunk in chunks:
+        chunk = prepare_invoices(chunk)
+        if chunk.empty:
+            continue
+        chunk_partials = chunk.groupby(customer).agg(
+            first_date=('invoicedate', 'min'),
+            last_date=('invoicedate', 'max'),
+            monetary=('total_price', 'sum'))
+
+        chunk_pairs = chunk[[customer, 'invoice']].drop_duplicates()
+        if contiguous_invoices:
+            counts = chunk_pairs.groupby(customer).size()
+            first_pair = tuple(chunk_pairs.iloc[0])
+            if first_pair == last_pair:
+                counts[first_pair[0]] -= 1
+            last_pair = tuple(chunk_pairs.iloc[-1])
+            chunk_partials['frequency'] = counts
+        else:
+            pairs.append(chunk_pairs)
+
+        # fold the chunk into the partial aggregates of the customers
+        if partials is not None:
+            chunk_partials = pd.concat([partials, chunk_partials]).groupby(level=0).agg(
+                {'first_date': 'min', 'last_date': 'max', 'monetary': 'sum', 'frequency': 'sum'}
+                if contiguous_invoices else {'first_date': 'min', 'last_date': 'max', 'monetary': 'sum'})
+        partials = chunk_partials
+
+    if contiguous_invoices:
+        frequency = partials['frequency']
+    else:
+        frequency = pd.concat(pairs).drop_duplicates().groupby(customer).size()
+
+    rfm = pd.DataFrame({'recency': (today_date - partials['last_date']).dt.days,
+                        'frequency': frequency.astype('int64'),
+                        'monetary': partials['monetary']})
+    rfm.index.name = customer
+    return rfm
+
+
+def compile_seg_map(seg_map=SEG_MAP):
+    """
+    codes, categories = compile_seg_map(seg_map)
+
+    evaluates the regexes of seg_map once for the 25 (recency_score, frequency_score) cells.
+    codes[recency_score - 1, frequency_score - 1] is the code of the segment in categories.
+    """
+    cells = pd.Series([f'{r}{f}' for r in range(1, 6) for f in range(1, 6)])
+    labels = cells.replace(seg_map, regex=True)
+    categories = pd.Index(list(dict.fromkeys([*seg_map.values(), *labels])))
+    categories = categories[categories.isin(labels)]
+    codes = categories.get_indexer(labels).reshape(5, 5)
+    return codes, categories
+
+
+_SEG_LOOKUP = compile_seg_map(SEG_MAP)
+
+
+def assign_segments(recency_score, frequency_score, seg_map=SEG_MAP):
+    """
+    rfm['segments'] = assign_segments(rfm['recency_score'], rfm['frequency_score'])
+
+    same labels as (recency_score.astype(str) + frequency_score.astype(str)).replace(seg_map, regex=True),
+    looked up in the compiled 5x5 table and returned as a categorical column
+    """
+    codes, categories = _SEG_LOOKUP if seg_map is SEG_MAP else compile_seg_map(seg_map)
+    r = np.asarray(recency_score, dtype='int64') - 1
+    f = np.asarray(frequency_score, dtype='int64') - 1
+    return pd.Series(pd.Categorical.from_codes(codes[r, f], categories),
+                     index=getattr(recency_score, 'index', None), name='segments')
+
+
+def rfm_scores(rfm):
+    """adds recency_score, frequency_score, monetary_score and segments to the rfm dataframe"""
+    rfm['recency_score'] = pd.qcut(rfm['recency'], 5, labels=[5, 4, 3, 2, 1])
+    rfm['frequency_score'] = pd.qcut(rfm['frequency'].rank(method='first'), 5, labels=[1, 2, 3, 4, 5])
+    rfm['monetary_score'] = pd.qcut(rfm['monetary'], 5, labels=[1, 2, 3, 4, 5])
+    rfm['segments'] = assign_segments(rfm['recency_score'], rfm['frequency_score'])
+    return rfm
+
+
+def qcut_edges(digest, n_bins=5):
+    """
+    approximate bin edges of pd.qcut(values, n_bins) from a quantile sketch (TDigest) of the values,
+    e.g. of recency or monetary merged over chunks or partitions
+    """
+    return digest.quantile(np.linspace(0, 1, n_bins + 1))
+
+
+def qcut_scores(values, edges, labels):
+    """labels of the right-closed bins (edges[i], edges[i + 1]] of the values, as pd.qcut with these edges"""
+    codes = np.searchsorted(np.asarray(edges)[1:-1], np.asarray(values, dtype='float64'), side='left')
+    return np.asarray(labels)[codes]
+
+
+def frequency_counts(frequency):
+    """number of customers per frequency, merged over partitions with counts_1.add(counts_2, fill_value=0)"""
+    return frequency.value_counts().sort_index()
+
+
+def ranked_frequency_scores(frequency, counts, offsets=None, n_bins=5):
+    """
+    frequency_score of rfm_scores, pd.qcut(frequency.rank(method='first'), n_bins), from the frequency
+    counts of all customers instead of the whole frequency column. this one is exact: the qcut edges
+    of the ranks 1..n are 1 + i * (n - 1) / n_bins, and the rank of a customer is the number of
+    customers with a smaller frequency plus its position among the customers with the same frequency.
+    offsets: customers per frequency in the partitions before this one (partitions in rfm index order).
+    """
+    values = np.asarray(frequency)
+    below = counts.cumsum() - counts
+    ranks = below.reindex(values).to_numpy(dtype='int64') + pd.Series(values).groupby(values).cumcount().to_numpy()
+    if offsets is not None:
+        ranks += offsets.reindex(values, fill_value=0).to_numpy(dtype='int64')
+    # ranks - 1 compared with the edges in integers, so that the ties at an edge fall as in qcut
+    n = int(counts.sum())
+    codes = np.searchsorted(np.arange(1, n_bins) * (n - 1), n_bins * ranks, side='left')
+    return codes + 1
+
+
+class RFMScorer:
+    """
+    scorer = RFMScorer().fit(rfm)
+    scorer.save('models/rfm_scorer.json')
+    scorer = RFMScorer.load('models/rfm_scorer.json')
+    scorer.score(recency=12, frequency=7, monetary=1250.0)    # (5, 5, 5, 'champions')
+    scorer.transform(new_rfm)
+
+    the quintile edges of rfm_scores fitted once on a reference population, so that new or updated
+    customers are scored without the qcut of the whole population. every score is a binary search
+    in 4 edges (np.searchsorted for frames, bisect for one customer).
+    - recency and monetary: the pd.qcut edges; values outside the reference range get the first or last score
+    - frequency: pd.qcut ranks the reference customers with rank(method='first'), so customers with the
+      same frequency can get different scores. a new customer gets the score of the middle one of the
+      reference customers with its frequency; the edges are the smallest frequencies with a higher score
+      (inf for the scores that no frequency reaches, saved as Infinity in the json file)
+    fit_transform returns the scores of the reference population itself, same as rfm_scores.
+    """
+
+    def __init__(self, recency_edges=None, frequency_edges=None, monetary_edges=None, seg_map=SEG_MAP):
+        self.recency_edges = None if recency_edges is None else [float(edge) for edge in recency_edges]
+        self.frequency_edges = None if frequency_edges is None else [float(edge) for edge in frequency_edges]
+        self.monetary_edges = None if monetary_edges is None else [float(edge) for edge in monetary_edges]
+        self.seg_map = seg_map
+        codes, categories = _SEG_LOOKUP if seg_map is SEG_MAP else compile_seg_map(seg_map)
+        self._segments = [[categories[code] for code in row] for row in codes]
+
+    def fit(self, rfm):
+        """edges of the recency, ranked frequency and monetary quintiles of the reference rfm frame"""
+        quantiles = rfm[['recency', 'monetary']].quantile(np.linspace(0, 1, 6))
+        self.recency_edges = quantiles['recency'].to_list()
+        self.monetary_edges = quantiles['monetary'].to_list()
+        self.frequency_edges = self._frequency_edges(frequency_counts(rfm['frequency']))
+        return self
+
+    @classmethod
+    def from_sketches(cls, recency_digest, frequency_counts, monetary_digest, seg_map=SEG_MAP):
+        """scorer from TDigest sketches of recency and monetary and the frequency counts, merged over partitions"""
+        scorer = cls(qcut_edges(recency_digest), None, qcut_edges(monetary_digest), seg_map)
+        scorer.frequency_edges = scorer._frequency_edges(frequency_counts)
+        return scorer
+
+    @staticmethod
+    def _frequency_edges(counts):
+        # the i-th edge is the smallest frequency whose middle customer has a rank above 1 + i * (n - 1) / 5,
+        # compared in integers: 2 * (middle rank - 1) = customers below + customers up to the frequency - 1.
+        # when no frequency reaches a score its edge is inf (e.g. all customers with the same frequency score 3)
+        n = int(counts.sum())
+        up_to = counts.cumsum().to_numpy(dtype='int64')
+        twice_middle = up_to - counts.to_numpy(dtype='int64') + up_to - 1
+        positions = np.searchsorted(5 * twice_middle, 2 * np.arange(1, 5) * (n - 1), side='right')
+        frequencies = np.append(counts.index.to_numpy(dtype='float64'), np.inf)
+        return [float(edge) for edge in frequencies[positions]]
+
+    def fit_transform(self, rfm):
+        """fits the edges on rfm and returns its scores with the qcut rules (ties split in rank order)"""
+        self.fit(rfm)
+        scores = self.transform(rfm)
+        scores['frequency_score'] = ranked_frequency_scores(rfm['frequency'], frequency_counts(rfm['frequency']))
+        scores['segments'] = assign_segments(scores['recency_score'], scores['frequency_score'], self.seg_map)
+        return scores
+
+    def transform(self, rfm):
+        """recency_score, frequency_score, monetary_score and segments of the customers of an rfm frame"""
+        recency_score = 5 - np.searchsorted(self.recency_edges[1:-1], rfm['recency'].to_numpy(dtype='float64'), side='left')
+        frequency_score = 1 + np.searchsorted(self.frequency_edges, rfm['frequency'].to_numpy(dtype='float64'), side='right')
+        monetary_score = 1 + np.searchsorted(self.monetary_edges[1:-1], rfm['monetary'].to_numpy(dtype='float64'), side='left')
+        scores = pd.DataFrame({'recency_score': recency_score, 'frequency_score': frequency_score,
+                               'monetary_score': monetary_score}, index=rfm.index)
+        scores['segments'] = assign_segments(scores['recency_score'], scores['frequency_score'], self.seg_map)
+        return scores
+
+    def score(self, recency, frequency, monetary):
+        """(recency_score, frequency_score, monetary_score, segment) of one customer"""
+        # bisect in the inner edges (positions 1..4) returns 1 + the number of inner edges below the value
+        recency_score = 6 - bisect_left(self.recency_edges, recency, 1, 5)
+        frequency_score = 1 + bisect_right(self.frequency_edges, frequency)
+        monetary_score = bisect_left(self.monetary_edges, monetary, 1, 5)
+        return recency_score, frequency_score, monetary_score, self._segments[recency_score - 1][frequency_score - 1]
+
+    def to_dict(self):
+        return {'recency_edges': self.recency_edges, 'frequency_edges': self.frequency_edges,
+                'monetary_edges': self.monetary_edges, 'seg_map': self.seg_map}
+
+    @classmethod
+    def from_dict(cls, entry):
+        seg_map = SEG_MAP if entry['seg_map'] == SEG_MAP else entry['seg_map']
+        return cls(entry['recency_edges'], entry['frequency_edges'], entry['monetary_edges'], seg_map)
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+
+def create_rfm(dataframe, today_date=dt.datetime(2011, 12, 11), method='groupby', csv=False):
+    """same output as create_rfm in the 04_hafta rfm scripts"""
+    dataframe = prepare_invoices(dataframe)
+    rfm = rfm_metrics(dataframe, today_date, method=method)
+    return _finalize_rfm(rfm, csv)
+
+
+def create_rfm_streaming(chunks, today_date=dt.datetime(2011, 12, 11), contiguous_invoices=False, csv=False):
+    """
+    rfm = create_rfm_streaming(read_invoice_chunks('datasets/online_retail_II.csv'))
+
+    same output as create_rfm without loading the whole table into memory. memory is O(customers + invoices),
+    O(customers) with contiguous_invoices=True (see rfm_metrics_streaming)
+    """
+    rfm = rfm_metrics_streaming(chunks, today_date, contiguous_invoices=contiguous_invoices)
+    return _finalize_rfm(rfm, csv)
+
+
+def _finalize_rfm(rfm, csv=False):
+    rfm = rfm[rfm['monetary'] > 0].copy()
+    rfm = rfm_scores(rfm)
+
+    rfm = rfm[['recency', 'frequency', 'monetary', 'segments']]
+    rfm.index = rfm.index.astype(int)
+
+    # saving a separate file the last dataframe
+    if csv:
+        rfm.to_csv('rfm.csv')
+
+    return rfm
@@ -0,0 +1,182 @@
+##########################################################################
+# Sketches for very large frames
+##########################################################################
+# fixed-size summaries that are built in one vectorized pass over a column
+# and can be merged across chunks.
+#
+# hll = HyperLogLog(error=0.01).add(df['stockcode'])
+# hll.estimate()      # ~ df['stockcode'].nunique()
+#
+# digest = TDigest().add(chunk_1['monetary']).merge(TDigest().add(chunk_2['monetary']))
+# digest.quantile([0.01, 0.99])    # ~ monetary.quantile([0.01, 0.99])
+
+import numpy as np
+import pandas as pd
+
+
+def hash_values(values, present=None):
+    """64-bit hash of every non-missing value (the hash of pandas, which also handles strings)"""
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    present = values.notna().to_numpy() if present is None else present
+    if not present.all():
+        values = values[present]
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+class HyperLogLog:
+    """
+    approximate number of distinct values with a relative standard error of 1.04 / sqrt(2 ** p).
+    error: the wanted relative standard error, p is the smallest precision that reaches it
+    (between 4 and 18, 2 ** p one-byte registers).
+    """
+
+    def __init__(self, error=0.01, p=None):
+        if p is None:
+            p = int(np.ceil(np.log2((1.04 / error) ** 2)))
+        self.p = min(max(p, 4), 18)
+        self.m = 1 << self.p
+        self.registers = np.zeros(self.m, dtype='uint8')
+
+    @property
+    def error(self):
+        """relative standard error of the estimate"""
+        return 1.04 / np.sqrt(self.m)
+
+    def add(self, values, present=None):
+        """adds the non-missing values (present: their mask, if it is already known)"""
+        return self.add_hashes(hash_values(values, present))
+
+    def add_hashes(self, hashes):
+        """adds 64-bit hashes of values"""
+        if len(hashes) == 0:
+            return self
+        # the first p bits choose the register, the rank is the position of the first 1 bit of the rest
+        max_rank = 64 - self.p + 1
+        index = (hashes >> np.uint64(64 - self.p)).view('int64')
+        # floor(log2(rest)) is the exponent of rest as float64 (0 gives -1023)
+        exponent = ((hashes << np.uint64(self.p)).astype('float64').view('int64') >> 52) - 1023
+        rank = np.minimum(64 - exponent, max_rank, out=exponent)
+
+        # maximum rank per register without np.maximum.at: mark the (register, rank) pairs that occur
+        seen = np.zeros((self.m, max_rank + 1), dtype=bool)
+        index *= max_rank + 1
+        index += rank
+        seen.ravel()[index] = True
+        highest = max_rank - np.argmax(seen[:, ::-1], axis=1)
+        highest[~seen.any(axis=1)] = 0
+        np.maximum(self.registers, highest.astype('uint8'), out=self.registers)
+        return self
+
+    def merge(self, other):
+        """union of two sketches with the same precision"""
+        if other.p != self.p:
+            raise ValueError(f'can not merge sketches with p={self.p} and p={other.p}')
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = self.m
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype('int64')))
+        zeros = np.count_nonzero(self.registers == 0)
+        # small cardinalities: linear counting on the empty registers
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+
+class TDigest:
+    """
+    approximate quantiles of a numeric column from weighted centroids (merging t-digest with the k1
+    scale function, so the centroids are small in the tails). built per chunk with add() and combined
+    with merge(); the centroids are compressed to about `compression` when there are more than
+    buffer_size (10 * compression) of them. while no more than buffer_size values were added the
+    centroids are the values themselves and quantile() equals pandas quantile.
+
+    error against pandas quantile (benchmarks/bench_quantile_sketch.py, 1M and 10M values built from
+    10 and 50 merged partitions, compression=500): the fraction of the values below the sketch quantile
+    is within 0.001 of q for q in 0.01 ... 0.99, and 99.5% of the customers get the same qcut score.
+    the error grows slowly with the number of values and shrinks with compression.
+    """
+
+    def __init__(self, compression=500, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or 10 * compression
+        self.means = np.array([], dtype='float64')
+        self.weights = np.array([], dtype='float64')
+        self.min = np.inf
+        self.max = -np.inf
+        # whole-number columns (counts, days) get whole-number quantiles once compressed
+        self.whole = True
+        self.compressed = False
+
+    @property
+    def n(self):
+        return float(self.weights.sum())
+
+    def add(self, values):
+        """adds the non-missing values of an array or series"""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+            self.whole = self.whole and bool(np.all(values == np.round(values)))
+            self._update(values, np.ones(len(values)))
+        return self
+
+    def merge(self, other):
+        """union of two digests, e.g. of two chunks or partitions"""
+        if len(other.weights):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.whole = self.whole and other.whole
+            self.compressed = self.compressed or other.compressed
+            self._update(other.means, other.weights)
+        return self
+
+    def _update(self, means, weights):
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind='stable')
+        self.means, self.weights = means[order], weights[order]
+        if len(self.means) > self.buffer_size:
+            self._compress()
+
+    def _compress(self):
+        # the centroids are grouped by the integer part of k1(q) at their middle rank:
+        # a group covers at most one unit of k, which is a few values in the tails
+        weights = self.weights
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / np.pi * np.arcsin(2 * q - 1)
+        groups = np.floor(k - k[0]).astype('int64')
+        sums = np.bincount(groups, weights=weights * self.means)
+        counts = np.bincount(groups, weights=weights)
+        present = counts > 0
+        self.means, self.weights = sums[present] / counts[present], counts[present]
+        self.compressed = True
+
+    def quantile(self, q):
+        """linear quantiles as in pandas: the centroid means sit at the middle rank of their values"""
+        scalar = np.ndim(q) == 0
+        q = np.atleast_1d(np.asarray(q, dtype='float64'))
+        n = self.n
+        if n == 0:
+            result = np.full(len(q), np.nan)
+        elif n == 1:
+            result = np.full(len(q), self.means[0])
+        else:
+            ranks = np.cumsum(self.weights) - (self.weights + 1) / 2
+            ranks = np.concatenate([[0.0], ranks, [n - 1]])
+            means = np.concatenate([[self.min], self.means, [self.max]])
+            result = np.interp(q * (n - 1), ranks, means)
+            if self.whole and self.compressed:
+                # an exact quantile of whole numbers is a whole number except between two ties
+                result = np.round(result)
+        return result[0] if scalar else result
+
+
+def digest_columns(dataframe, columns, compression=500):
+    """{column: TDigest} of the columns of one chunk, merged per column over the chunks"""
+    return {col: TDigest(compression).add(dataframe[col]) for col in columns}